@@ -0,0 +1 @@
+# Shared data, lookup and prediction helpers used by the Streamlit apps.
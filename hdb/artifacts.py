@@ -0,0 +1,103 @@
+# Column store of .npy files that loads memory-mapped, for artifacts built offline.
+#
+# A frame is saved as a directory with one file per column and a meta.json describing them.
+# String and categorical columns are stored as integer codes plus a categories array, numeric and
+# datetime columns as plain arrays, so every file can be mapped with np.load(mmap_mode='r').
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+META_FILE = 'meta.json'
+
+
+def _write_directory(directory, write):
+    # Writes into a temporary directory and swaps it in, so readers never see a half-written artifact
+    tmp = f'{directory}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    write(tmp)
+    old = f'{directory}.old-{os.getpid()}'
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _save_columns(frame, directory):
+    columns = []
+    for i, (name, series) in enumerate(frame.items()):
+        stem = os.path.join(directory, f'{i:03d}')
+        if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object or pd.api.types.is_string_dtype(series):
+            values = series.astype('category')
+            np.save(f'{stem}.codes.npy', values.cat.codes.to_numpy())
+            np.save(f'{stem}.categories.npy', values.cat.categories.to_numpy().astype(str))
+            kind = 'category'
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            np.save(f'{stem}.npy', series.to_numpy().astype('datetime64[ns]'))
+            kind = 'datetime'
+        else:
+            np.save(f'{stem}.npy', series.to_numpy())
+            kind = 'numeric'
+        columns.append({'name': name, 'file': f'{i:03d}', 'kind': kind})
+    return columns
+
+
+def _write_meta(directory, meta):
+    with open(os.path.join(directory, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+
+def save_frame(frame, directory, **meta):
+    def write(tmp):
+        _write_meta(tmp, {'columns': _save_columns(frame, tmp), 'rows': len(frame), **meta})
+    _write_directory(directory, write)
+
+
+def save_frames(frames, directory, **meta):
+    # Several frames in one artifact, each in its own subdirectory
+    def write(tmp):
+        for name, frame in frames.items():
+            sub = os.path.join(tmp, name)
+            os.makedirs(sub)
+            _write_meta(sub, {'columns': _save_columns(frame, sub), 'rows': len(frame)})
+        _write_meta(tmp, {'frames': list(frames), **meta})
+    _write_directory(directory, write)
+
+
+def save_files(directory, write, **meta):
+    # Files of any other format, written by write(tmp), swapped in together with their meta.json
+    def write_all(tmp):
+        write(tmp)
+        _write_meta(tmp, meta)
+    _write_directory(directory, write_all)
+
+
+def load_meta(directory):
+    with open(os.path.join(directory, META_FILE)) as f:
+        return json.load(f)
+
+
+def load_frame(directory, mmap=True):
+    # Every column stays backed by the mapped files, so processes mapping the same artifact share
+    # its pages; only the (small) category arrays are read into memory
+    meta = load_meta(directory)
+    mode = 'r' if mmap else None
+    columns = {}
+    for column in meta['columns']:
+        stem = os.path.join(directory, column['file'])
+        if column['kind'] == 'category':
+            codes = np.load(f'{stem}.codes.npy', mmap_mode=mode)
+            categories = np.load(f'{stem}.categories.npy')
+            # The codes were written by _save_columns, so skipping validation avoids a full copy
+            columns[column['name']] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories), validate=False)
+        else:
+            columns[column['name']] = np.load(f'{stem}.npy', mmap_mode=mode)
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_frames(directory, mmap=True):
+    meta = load_meta(directory)
+    return {name: load_frame(os.path.join(directory, name), mmap) for name in meta['frames']}
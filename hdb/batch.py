@@ -0,0 +1,116 @@
+# Values a portfolio of units at once: derives the per-address features for every row, then
+# runs predictions in chunks with bounded concurrency and streams the results back.
+# Usage: python -m hdb.batch units.csv valuations.csv|valuations.parquet [--chunk-size 500] [--workers 4]
+import argparse
+import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from hdb.feature_table import read_feature_table
+from hdb.features import DEFAULT_YEAR, FEATURE_KEYS, params_frame
+from hdb.predictor import PredictionError, make_predictor
+
+BATCH_COLUMNS = ['address', 'flat_type', 'storey_range', 'floor_area_sqm', 'flat_model']
+RESULT_COLUMNS = BATCH_COLUMNS + ['year', 'town', 'lease_commence_date', 'remaining_lease', 'predicted_price', 'error']
+
+CHUNK_SIZE = 500
+MAX_WORKERS = 4
+
+
+def prepare_batch(batch, features):
+    missing = [col for col in BATCH_COLUMNS if col not in batch.columns]
+    if missing:
+        raise ValueError(f'Missing columns: {", ".join(missing)}')
+    batch = batch.copy()
+    for col in ['address', 'flat_type', 'storey_range', 'flat_model']:
+        batch[col] = batch[col].astype(str).str.strip()
+    batch['address'] = batch['address'].str.upper()
+    batch['flat_type'] = batch['flat_type'].str.upper()
+    # Values that are not numbers (e.g. '92 sqm') are flagged per row rather than failing the batch
+    batch['floor_area_sqm'] = pd.to_numeric(batch['floor_area_sqm'], errors='coerce')
+    invalid = batch['floor_area_sqm'].isna()
+    if 'year' in batch.columns:
+        year = pd.to_numeric(batch['year'], errors='coerce')
+        invalid |= year.isna() & batch['year'].notna()
+        batch['year'] = year.fillna(DEFAULT_YEAR).astype('int64')
+    else:
+        batch['year'] = DEFAULT_YEAR
+    batch['error'] = np.where(invalid, 'invalid floor_area_sqm or year', '')
+    features = features.astype({key: str for key in FEATURE_KEYS})
+    rows = batch.merge(features, on=FEATURE_KEYS, how='left')
+    rows['remaining_lease'] = 99 - (rows['year'] - rows['lease_commence_date'])
+    rows['error'] = rows['error'].mask((rows['error'] == '') & rows['town'].isna(), 'unknown address or flat type')
+    return rows
+
+
+def _value_chunk(chunk, predictor):
+    prices = np.full(len(chunk), np.nan)
+    errors = chunk['error'].to_numpy(dtype=object)
+    known = errors == ''
+    if known.any():
+        try:
+            prices[known] = predictor.predict_many(params_frame(chunk[known]))
+        except PredictionError as e:
+            errors[known] = str(e)
+    errors[known & np.isnan(prices) & (errors == '')] = 'prediction failed'
+    result = chunk.assign(predicted_price=prices, error=errors)
+    return result[RESULT_COLUMNS]
+
+
+def value_batch(rows, predictor, chunk_size=CHUNK_SIZE, max_workers=MAX_WORKERS):
+    # Yields result chunks in input order; at most max_workers chunks are in flight at a time
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hdb-batch') as executor:
+        pending = deque()
+        for start in range(0, len(rows), chunk_size):
+            pending.append(executor.submit(_value_chunk, rows.iloc[start:start + chunk_size], predictor))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def to_csv_bytes(results):
+    return results.to_csv(index=False).encode()
+
+
+def to_parquet_bytes(results):
+    buffer = io.BytesIO()
+    results.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Value a CSV of HDB units in bulk')
+    parser.add_argument('input', help='CSV with address, flat_type, storey_range, floor_area_sqm, flat_model '
+                                      f'and optionally year (defaults to {DEFAULT_YEAR})')
+    parser.add_argument('output', help='.csv or .parquet file for the results')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    args = parser.parse_args(argv)
+
+    features = read_feature_table().features
+    rows = prepare_batch(pd.read_csv(args.input), features)
+    chunks = value_batch(rows, make_predictor(), args.chunk_size, args.workers)
+
+    done = 0
+    if args.output.endswith('.parquet'):
+        results = []
+        for chunk in chunks:
+            results.append(chunk)
+            done += len(chunk)
+            print(f'{done}/{len(rows)} rows valued')
+        pd.concat(results, ignore_index=True).to_parquet(args.output, index=False)
+    else:
+        # CSV results are appended as each chunk finishes
+        with open(args.output, 'w', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=i == 0)
+                done += len(chunk)
+                print(f'{done}/{len(rows)} rows valued')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+# Benchmarks for the data-access and prediction paths on synthetic datasets, with a JSON history
+# so every run can be compared against the previous one at the same scale.
+# Usage: python -m hdb.bench [--scales 1,10,100] [--repeat 5] [--history artifacts/bench_history.jsonl]
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from hdb import data
+from hdb.client import PredictionClient
+from hdb.feature_table import FeatureTable
+from hdb.features import DEFAULT_YEAR, address_features, prediction_params
+from hdb.lookup import AddressIndex
+from hdb.predictor import RemotePredictor
+from hdb.search import AddressSearch
+from hdb.stub_server import start_stub_server
+from hdb.transactions import TransactionStore
+
+# Scale 1 is roughly the size of the published datasets
+BASE_BLOCKS = 10_000
+BASE_TRANSACTIONS = 200_000
+QUERIES = 200
+HISTORY_PATH = os.path.join('artifacts', 'bench_history.jsonl')
+# A benchmark is reported as a regression when its median is this much slower than last time
+REGRESSION_THRESHOLD = 0.2
+
+TOWNS = ['ANG MO KIO', 'BEDOK', 'BUKIT MERAH', 'CHOA CHU KANG', 'HOUGANG', 'JURONG WEST', 'KALLANG/WHAMPOA',
+         'PUNGGOL', 'SENGKANG', 'TAMPINES', 'WOODLANDS', 'YISHUN']
+FLAT_TYPES = ['2 ROOM', '3 ROOM', '4 ROOM', '5 ROOM', 'EXECUTIVE']
+STOREY_RANGES = [f'{low:02d} TO {low + 2:02d}' for low in range(1, 40, 3)]
+FLAT_MODELS = ['Improved', 'New Generation', 'Model A', 'Premium Apartment', 'Simplified', 'Standard']
+FLOOR_AREAS = [45.0, 67.0, 82.0, 92.0, 104.0, 121.0, 145.0]
+
+
+def make_dataset(directory, scale, seed=0):
+    # Writes hdb_unique_info.csv and final_HDB_for_model.parquet.gzip with the columns the apps read
+    rng = np.random.default_rng(seed)
+    blocks = int(BASE_BLOCKS * scale)
+    towns = rng.integers(0, len(TOWNS), blocks)
+    stations = np.array([f'{TOWNS[t]} {i % 4}' for i, t in enumerate(towns)])
+    block = pd.DataFrame({
+        'address': [f'{i + 1} STREET {i % 97}' for i in range(blocks)],
+        'town': np.array(TOWNS)[towns],
+        'lease_commence_date': rng.integers(1966, 2020, blocks),
+        'max_floor_lvl': rng.integers(4, 40, blocks),
+        'HDB_lat': 1.28 + rng.random(blocks) * 0.17,
+        'HDB_lon': 103.70 + rng.random(blocks) * 0.25,
+        'most_closest_mrt': stations,
+        'MRT': stations,
+        'walking_time_mrt': rng.integers(60, 1800, blocks).astype('float64'),
+    })
+    block['mrt_lat'] = block['HDB_lat'] + rng.normal(0, 0.003, blocks)
+    block['mrt_lon'] = block['HDB_lon'] + rng.normal(0, 0.003, blocks)
+    # Each block has a few unit combinations of one or two flat types
+    units = block.loc[np.repeat(np.arange(blocks), 4)].reset_index(drop=True)
+    n = len(units)
+    smallest = rng.integers(0, len(FLAT_TYPES) - 1, blocks).repeat(4)
+    units['flat_type'] = np.array(FLAT_TYPES)[smallest + rng.integers(0, 2, n)]
+    units['storey_range'] = np.array(STOREY_RANGES)[rng.integers(0, len(STOREY_RANGES), n)]
+    units['flat_model'] = np.array(FLAT_MODELS)[rng.integers(0, len(FLAT_MODELS), n)]
+    units['floor_area_sqm'] = np.array(FLOOR_AREAS)[rng.integers(0, len(FLOOR_AREAS), n)]
+    units = units.drop_duplicates(['address', 'flat_type', 'storey_range', 'flat_model', 'floor_area_sqm'])
+    units[data.UNIQUE_INFO_COLUMNS].to_csv(os.path.join(directory, data.UNIQUE_INFO_PATH), index=False)
+
+    sales = units.sample(int(BASE_TRANSACTIONS * scale), replace=True, random_state=seed).reset_index(drop=True)
+    months = pd.date_range('1990-01-01', '2024-06-01', freq='MS').to_numpy()
+    sales['sold_year_month'] = months[rng.integers(0, len(months), len(sales))]
+    sales['sold_year'] = sales['sold_year_month'].dt.year
+    sales['resale_price'] = (sales['floor_area_sqm'] * 4500 + rng.normal(0, 40000, len(sales))).round(-3)
+    columns = data.TRANSACTION_COLUMNS + ['flat_model', 'max_floor_lvl']
+    sales[columns].to_parquet(os.path.join(directory, data.TRANSACTIONS_PATH), compression='gzip', index=False)
+    return len(units), len(sales)
+
+
+def measure(function, repeat):
+    # Seconds per call: best and median of `repeat` runs
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'min_s': min(times), 'median_s': float(np.median(times)), 'repeat': repeat}
+
+
+def run_benchmarks(directory, repeat=5, queries=QUERIES, seed=0):
+    unique_path = os.path.join(directory, data.UNIQUE_INFO_PATH)
+    transactions_path = os.path.join(directory, data.TRANSACTIONS_PATH)
+    results = {}
+
+    results['load_unique_info'] = measure(lambda: data.read_unique_info(unique_path), repeat)
+    results['load_transactions'] = measure(lambda: data.read_transactions(transactions_path), repeat)
+    unique_info = data.read_unique_info(unique_path)
+    transactions = data.read_transactions(transactions_path)
+    results['build_transaction_store'] = measure(lambda: TransactionStore(transactions), repeat)
+    results['build_feature_table'] = measure(lambda: FeatureTable.build(unique_info), repeat)
+    results['build_address_index'] = measure(lambda: AddressIndex(unique_info), repeat)
+    results['feature_derivation'] = measure(lambda: address_features(unique_info), repeat)
+
+    store = TransactionStore(transactions)
+    table = FeatureTable.build(unique_info)
+    index = AddressIndex(unique_info)
+    search = AddressSearch(index.addresses)
+    rng = np.random.default_rng(seed)
+    keys = table.features[['address', 'flat_type', 'town', 'lease_commence_date']].astype(str)
+    keys = keys.iloc[rng.integers(0, len(keys), queries)].itertuples(index=False)
+    keys = [(address, flat_type, town, int(lcd)) for address, flat_type, town, lcd in keys]
+
+    # Per-query paths, timed over a batch of random keys and reported per query
+    def per_query(name, function):
+        result = measure(lambda: [function(*key) for key in keys], repeat)
+        results[name] = {**result, 'min_s': result['min_s'] / queries, 'median_s': result['median_s'] / queries,
+                         'queries': queries}
+
+    per_query('address_lookup', lambda address, *_: index.lookup(address))
+    per_query('feature_lookup', lambda address, flat_type, *_: table.lookup(address, flat_type))
+    per_query('sidebar_options', lambda address, flat_type, *_: [table.options(address, flat_type, column)
+                                                                 for column in ['storey_range', 'flat_model', 'floor_area_sqm']])
+    per_query('address_search', lambda address, *_: search.search(address[:6]))
+    per_query('recent_transactions', lambda address, flat_type, *_: store.recent_transactions(address, flat_type))
+    per_query('historical_mean', lambda address, flat_type, town, lcd: store.historical_mean(town, flat_type, lcd))
+    # The full-table scan the apps did before the precomputed indexes, kept as a reference point
+    per_query('historical_mean_scan', lambda address, flat_type, town, lcd: transactions[
+        (transactions['town'] == town) & (transactions['flat_type'] == flat_type)
+        & (transactions['lease_commence_date'] == lcd)].groupby('sold_year', observed=True)['resale_price'].mean())
+
+    server, url = start_stub_server()
+    predictor = RemotePredictor(PredictionClient(url, retries=0))
+    try:
+        def params(address, flat_type, *_):
+            features = table.lookup(address, flat_type)
+            return prediction_params(DEFAULT_YEAR, features['town'], flat_type, STOREY_RANGES[0], FLOOR_AREAS[2],
+                                     FLAT_MODELS[0], features['lease_commence_date'], features['max_floor_lvl'],
+                                     features['closest_mrt'], features['walking_time_mrt'])
+        per_query('predict_roundtrip', lambda *key: predictor.predict_all(params(*key)))
+    finally:
+        predictor.client.close()
+        server.shutdown()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_run(history_path, scale):
+    previous = None
+    if os.path.exists(history_path):
+        with open(history_path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['scale'] == scale:
+                    previous = entry
+    return previous
+
+
+def regressions(results, previous, threshold=REGRESSION_THRESHOLD):
+    found = []
+    for name, result in results.items():
+        before = (previous or {}).get('results', {}).get(name)
+        if before and result['median_s'] > before['median_s'] * (1 + threshold):
+            found.append((name, before['median_s'], result['median_s']))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the data-access and prediction paths')
+    parser.add_argument('--scales', default='1,10,100', help='comma-separated multiples of the published data size')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=QUERIES)
+    parser.add_argument('--history', default=HISTORY_PATH, help='JSON-lines file the results are appended to')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for scale in [float(scale) for scale in args.scales.split(',')]:
+        with tempfile.TemporaryDirectory(prefix='hdb-bench-') as directory:
+            blocks, sales = make_dataset(directory, scale)
+            print(f'scale {scale:g}: {blocks:,} unit rows, {sales:,} transactions')
+            results = run_benchmarks(directory, args.repeat, args.queries)
+        for name, result in results.items():
+            print(f'  {name:<26} median {result["median_s"] * 1000:10.3f} ms   min {result["min_s"] * 1000:10.3f} ms')
+
+        previous = last_run(args.history, scale)
+        for name, before, after in regressions(results, previous):
+            failed = True
+            print(f'  REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms')
+        entry = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': git_revision(), 'scale': scale,
+                 'rows': {'unique_info': blocks, 'transactions': sales}, 'python': platform.python_version(),
+                 'pandas': pd.__version__, 'results': results}
+        os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+    if failed and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
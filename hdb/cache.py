@@ -0,0 +1,125 @@
+# Memoizes prediction API responses by their normalized parameters, with LRU/TTL eviction.
+import json
+import numbers
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from hdb import config
+from hdb.features import PARAM_NAMES
+
+MISSING = object()
+
+
+def cache_key(endpoint, params):
+    # Numbers are rounded so 12.0, 12 and np.float64(12) share an entry
+    values = [endpoint]
+    for name in PARAM_NAMES:
+        value = params.get(name)
+        if isinstance(value, numbers.Number):
+            value = round(float(value), 4)
+        elif value is not None:
+            value = str(value).strip()
+        values.append(value)
+    return json.dumps(values)
+
+
+class SQLiteBackend:
+    # Expired rows are deleted, and the oldest rows beyond max_size, every PRUNE_INTERVAL writes
+    PRUNE_INTERVAL = 100
+
+    def __init__(self, path, max_size=config.CACHE_SIZE):
+        self.max_size = max_size
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS predictions '
+                               '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS predictions_expires_at ON predictions (expires_at)')
+            self._prune()
+
+    def _prune(self):
+        # Every entry lives for the same ttl, so the earliest expiring rows are the oldest ones
+        self._conn.execute('DELETE FROM predictions WHERE expires_at <= ?', (time.time(),))
+        self._conn.execute('DELETE FROM predictions WHERE key IN '
+                           '(SELECT key FROM predictions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)', (self.max_size,))
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires_at FROM predictions WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return MISSING, None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)', (key, json.dumps(value), expires_at))
+            self._writes += 1
+            if self._writes % self.PRUNE_INTERVAL == 0:
+                self._prune()
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM predictions')
+
+
+class PredictionCache:
+    def __init__(self, max_size=config.CACHE_SIZE, ttl=config.CACHE_TTL, path=config.CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._backend = SQLiteBackend(path, max_size) if path else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        if self._backend is not None:
+            value, expires_at = self._backend.get(key)
+            if value is not MISSING:
+                self._remember(key, value, expires_at)
+                with self._lock:
+                    self.hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return MISSING
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self._backend is not None:
+            self._backend.set(key, value, expires_at)
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if self._backend is not None:
+            self._backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                    'max_size': self.max_size, 'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,63 @@
+# Pooled HTTP client for the prediction API, with timeouts, retries and concurrent endpoint calls.
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from hdb import config, metrics
+from hdb.cache import MISSING, cache_key
+
+
+class PredictionClient:
+    def __init__(self, base_url=config.API_URL, connect_timeout=config.API_CONNECT_TIMEOUT,
+                 read_timeout=config.API_READ_TIMEOUT, retries=config.API_RETRIES,
+                 backoff=config.API_BACKOFF, pool_size=config.API_POOL_SIZE, cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.timeout = (connect_timeout, read_timeout)
+        # Retry connection errors and transient server responses, e.g. while the API cold starts
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        # One session keeps the TLS connections alive between submits
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='hdb-predict')
+
+    def _get(self, endpoint, params):
+        if self.cache is not None:
+            key = cache_key(f'{self.base_url}/{endpoint}', params)
+            body = self.cache.get(key)
+            if body is not MISSING:
+                return body
+        metrics.increment('http_requests')
+        try:
+            with metrics.timer(f'http_{endpoint}'):
+                response = self.session.get(f'{self.base_url}/{endpoint}', params=params, timeout=self.timeout)
+                response.raise_for_status()
+                body = response.json()
+        except requests.RequestException:
+            metrics.increment('http_errors')
+            raise
+        if self.cache is not None:
+            self.cache.set(key, body)
+        return body
+
+    def predict(self, params):
+        return self._get('predict', params).get('hdb_pricing')
+
+    def full_predict(self, params):
+        return self._get('fullpredict', params)
+
+    def predict_all(self, params):
+        # Fires /predict and /fullpredict concurrently; raises requests.RequestException if either fails
+        prediction = self._executor.submit(self.predict, params)
+        full_prediction = self._executor.submit(self.full_predict, params)
+        return prediction.result(), full_prediction.result()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
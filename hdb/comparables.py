@@ -0,0 +1,83 @@
+# Finds the most similar recent sales around a block, using the spatial index to pick nearby
+# blocks and the pre-sorted transaction store to pull their sales as row ranges.
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from hdb import config, data
+from hdb.spatial import _build_spatial_index
+from hdb.transactions import load_transaction_store
+
+RADIUS_M = 1000
+RECENT_MONTHS = 36
+# Differences that count as one unit of dissimilarity
+SCALE_FLOOR_AREA = 10.0
+SCALE_STOREY = 6.0
+SCALE_LEASE = 5.0
+SCALE_DISTANCE = 500.0
+SCALE_MONTHS = 12.0
+
+COMPARABLE_COLUMNS = {'address': 'Address', 'sold_year_month': 'Date Sold', 'storey_range': 'Storey Range',
+                      'floor_area_sqm': 'Floor Area (sqm)', 'lease_commence_date': 'Lease Commenced',
+                      'distance_m': 'Distance (m)', 'resale_price': 'Resale Price'}
+
+
+def storey_midpoint(storey_range):
+    # '10 TO 12' -> 11.0
+    floors = [int(n) for n in re.findall(r'\d+', str(storey_range))]
+    return sum(floors) / len(floors) if floors else np.nan
+
+
+class ComparablesEngine:
+    def __init__(self, store, spatial_index):
+        self.store = store
+        self.spatial_index = spatial_index
+        frame = store.frame
+        # Per-row numeric arrays, so scoring a candidate set is pure NumPy
+        storeys = frame['storey_range'].astype('category')
+        midpoints = np.array([storey_midpoint(c) for c in storeys.cat.categories], dtype=np.float32)
+        self.storey = midpoints[storeys.cat.codes.to_numpy()]
+        self.floor_area = frame['floor_area_sqm'].to_numpy(dtype=np.float32)
+        self.lease = frame['lease_commence_date'].to_numpy(dtype=np.float32)
+        sold = pd.to_datetime(frame['sold_year_month'])
+        self.month = (sold.dt.year * 12 + sold.dt.month - 1).to_numpy(dtype=np.int32)
+        self.latest_month = int(self.month.max()) if len(self.month) else 0
+
+    def find(self, address, flat_type, floor_area, storey_range, lease_commence_date, n=10,
+             radius_m=RADIUS_M, months=RECENT_MONTHS):
+        addresses, distances = self.spatial_index.addresses_within(address, radius_m)
+        ranges = [(self.store.row_range(nearby, flat_type), distance) for nearby, distance in zip(addresses, distances)]
+        ranges = [((start, stop), distance) for (start, stop), distance in ranges if stop > start]
+        if not ranges:
+            return pd.DataFrame()
+        rows = np.concatenate([np.arange(start, stop) for (start, stop), _ in ranges])
+        row_distance = np.concatenate([np.full(stop - start, distance) for (start, stop), distance in ranges])
+        recent = self.month[rows] >= self.latest_month - months
+        rows, row_distance = rows[recent], row_distance[recent]
+        if not len(rows):
+            return pd.DataFrame()
+
+        score = np.sqrt(((self.floor_area[rows] - floor_area) / SCALE_FLOOR_AREA) ** 2
+                        + ((self.storey[rows] - storey_midpoint(storey_range)) / SCALE_STOREY) ** 2
+                        + ((self.lease[rows] - lease_commence_date) / SCALE_LEASE) ** 2
+                        + (row_distance / SCALE_DISTANCE) ** 2
+                        + ((self.latest_month - self.month[rows]) / SCALE_MONTHS) ** 2)
+        best = np.argsort(score, kind='stable')[:n]
+        result = self.store.frame.iloc[rows[best]].assign(distance_m=row_distance[best].round())
+        return result[list(COMPARABLE_COLUMNS)].rename(columns=COMPARABLE_COLUMNS).reset_index(drop=True)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_comparables(unique_info_path, unique_info_signature, store_version, _store):
+    return ComparablesEngine(_store, _build_spatial_index(unique_info_path, unique_info_signature))
+
+
+def load_comparables(unique_info_path=data.UNIQUE_INFO_PATH, transactions_path=data.TRANSACTIONS_PATH):
+    # Needs the in-memory table; not available with the streaming transaction backend
+    if config.TRANSACTION_BACKEND == 'streaming':
+        return None
+    # Rebuilt whenever the transaction store picks up new partitions
+    store = load_transaction_store(transactions_path)
+    return _build_comparables(unique_info_path, data.file_signature(unique_info_path), store.version, store)
@@ -0,0 +1,63 @@
+# Settings read from the environment, with defaults matching the hosted deployment.
+import os
+
+# Prediction API
+API_URL = os.environ.get('HDB_API_URL', 'https://hdb-gobind.koyeb.app')
+API_CONNECT_TIMEOUT = float(os.environ.get('HDB_API_CONNECT_TIMEOUT', '3.05'))
+API_READ_TIMEOUT = float(os.environ.get('HDB_API_READ_TIMEOUT', '30'))
+API_RETRIES = int(os.environ.get('HDB_API_RETRIES', '3'))
+API_BACKOFF = float(os.environ.get('HDB_API_BACKOFF', '0.5'))
+API_POOL_SIZE = int(os.environ.get('HDB_API_POOL_SIZE', '20'))
+
+# Prediction cache; set HDB_CACHE_PATH to a file to keep entries across restarts in SQLite
+CACHE_SIZE = int(os.environ.get('HDB_CACHE_SIZE', '4096'))
+CACHE_TTL = float(os.environ.get('HDB_CACHE_TTL', '86400'))
+CACHE_PATH = os.environ.get('HDB_CACHE_PATH', '')
+
+# Prediction backend: 'remote' calls the API, 'local' loads HDB_MODEL_PATH into the app process
+PREDICTOR = os.environ.get('HDB_PREDICTOR', 'remote')
+MODEL_PATH = os.environ.get('HDB_MODEL_PATH', 'model.joblib')
+
+# Forecasts precomputed for every sidebar combination, built with python -m hdb.grid. When the
+# directory exists, submits are answered from it and only misses reach the predictor above
+FORECAST_GRID_PATH = os.environ.get('HDB_FORECAST_GRID', 'artifacts/forecast_grid')
+
+# Precomputed per-(address, flat_type) features, built with python -m hdb.feature_table
+FEATURE_TABLE_PATH = os.environ.get('HDB_FEATURE_TABLE', 'artifacts/features')
+
+# Rollup cube of sales by town, flat type and month for the market overview page, built with
+# python -m hdb.market
+MARKET_CUBE_PATH = os.environ.get('HDB_MARKET_CUBE', 'artifacts/market')
+
+# Number of matches the address search offers
+SEARCH_RESULTS = int(os.environ.get('HDB_SEARCH_RESULTS', '50'))
+
+# Number of per-address proximity maps kept in memory
+MAP_CACHE_SIZE = int(os.environ.get('HDB_MAP_CACHE_SIZE', '256'))
+
+# Optional CSV of MRT stations (columns: mrt, lat, lon); by default the stations named in
+# hdb_unique_info.csv are used
+MRT_STATIONS_PATH = os.environ.get('HDB_MRT_STATIONS', '')
+
+# Transaction backend: 'memory' holds the sorted table in each process, 'streaming' scans the
+# Parquet files row group by row group for each query and keeps memory flat
+TRANSACTION_BACKEND = os.environ.get('HDB_TRANSACTION_BACKEND', 'memory')
+# Snapshot the streaming backend scans: the transactions by town, sorted and in small row groups,
+# built with python -m hdb.streaming
+STREAMING_SNAPSHOT_PATH = os.environ.get('HDB_STREAMING_SNAPSHOT', 'artifacts/transactions_by_town')
+
+# Set HDB_DATA_HASH=1 to detect changed data files by content hash instead of mtime and size
+DATA_HASH = os.environ.get('HDB_DATA_HASH', '0') == '1'
+
+# Directory the loaded datasets are exported to as memory-mapped column files, so every worker
+# process on the host maps one shared copy instead of parsing its own; set to '' to disable
+SHARED_DATA_PATH = os.environ.get('HDB_SHARED_DATA', 'artifacts/dataset')
+
+# Set HDB_DEBUG=1 to show diagnostics (such as the session memory report) in the sidebar
+DEBUG = os.environ.get('HDB_DEBUG', '0') == '1'
+
+# Port for the Prometheus (/metrics) and JSON (/metrics.json) endpoint; 0 disables it. Each replica
+# on a host needs its own port; a process that cannot bind it runs without the endpoint
+METRICS_PORT = int(os.environ.get('HDB_METRICS_PORT', '0'))
+# Interface the endpoint listens on; set to 0.0.0.0 to let a scraper on another host reach it
+METRICS_HOST = os.environ.get('HDB_METRICS_HOST', '127.0.0.1')
@@ -0,0 +1,200 @@
+# Shared core of the app: the multipage entry point, and the datasets, predictor and maps every page
+# uses together with the sidebar and result sections they have in common. Everything is loaded once
+# per process, so all pages and sessions share one copy of the data and one set of caches.
+import time
+
+import pandas as pd
+import streamlit as st
+
+from hdb import metrics
+from hdb.comparables import load_comparables
+from hdb.feature_table import load_feature_table
+from hdb.features import prediction_params
+from hdb.lookup import load_address_index
+from hdb.maps import PROXIMITY_RADIUS, base_map, proximity_map, show_map
+from hdb.market import load_market_cube
+from hdb.search import load_address_search
+from hdb.session import show_memory_report, show_timings
+from hdb.spatial import load_spatial_index
+from hdb.startup import DEFERRED_MODULES, warm_up
+from hdb.transactions import load_transaction_store
+
+HEADER_IMAGE = 'For Streamlit.jpg'
+
+# Pages in navigation order, as (script, title, icon); scripts are relative to the entry script
+PAGES = [
+    ('pages/Price_Forecast.py', 'Price Forecast', ':material/show_chart:'),
+    ('pages/Price_Prediction.py', 'Price Prediction', ':material/home:'),
+    ('pages/Price_Estimator.py', 'Price Estimator', ':material/calculate:'),
+    ('pages/Market_Overview.py', 'Market Overview', ':material/bar_chart:'),
+    ('pages/Batch_Valuation.py', 'Batch Valuation', ':material/table_view:'),
+]
+
+
+def run_app(default=PAGES[0][0]):
+    # Only the address search is loaded before the first paint; the other datasets and the slow
+    # modules warm up in a background thread once per process (see hdb.startup)
+    warm_up(load_feature_table, load_transaction_store, load_address_index, load_spatial_index, load_comparables,
+            'hdb.predictor:load_predictor', load_market_cube, modules=DEFERRED_MODULES + ['plotly.express'])
+    metrics.start_metrics_server()
+    page = st.navigation([st.Page(script, title=title, icon=icon, default=script == default)
+                          for script, title, icon in PAGES])
+    rerun_start = time.perf_counter()
+    page.run()
+    metrics.observe('rerun', time.perf_counter() - rerun_start)
+    show_timings()
+    show_memory_report()
+
+
+def header(text):
+    st.image(HEADER_IMAGE, use_column_width=True)
+    st.write(text)
+    st.write('---')
+
+
+def init_state():
+    # Only selections are kept per session, and they carry over between pages
+    if 'address_submitted' not in st.session_state:
+        st.session_state['address_submitted'] = False
+    if 'flat_type_submitted' not in st.session_state:
+        st.session_state['flat_type_submitted'] = False
+    if 'submit_button' not in st.session_state:
+        st.session_state['submit_button'] = None
+
+
+# Function to set the state when the address is submitted
+def handle_address_submit():
+    st.session_state['address_submitted'] = True
+    # A new address starts the flat type and unit selection over
+    st.session_state['flat_type_submitted'] = False
+    st.session_state['submit_button'] = None
+    st.session_state.pop('flat_type', None)
+
+
+# Function to set the state when the flat_type is submitted
+def handle_flat_type_submit():
+    st.session_state['flat_type_submitted'] = True
+
+
+def address_picker(button='Select Address'):
+    # Sidebar address search and selection, and the overview map until a unit is submitted.
+    # Returns the submitted address: results follow it rather than the live selection, which is
+    # None while a search has no matches
+    st.sidebar.header('Specify Input Parameters')
+    init_state()
+    with metrics.timer('load'):
+        address_search = load_address_search()
+
+    address_query = st.sidebar.text_input("Search Address", placeholder="e.g. 123 Ang Mo Kio Ave 3")
+    with metrics.timer('search'):
+        address_matches = address_search.search(address_query)
+    if not address_matches:
+        st.sidebar.caption("No matching addresses")
+    address = st.sidebar.selectbox("Address", address_matches, placeholder="Choose an option", label_visibility="visible")
+
+    # When the user submits the address
+    if st.sidebar.button(button, on_click=handle_address_submit, disabled=address is None):
+        st.session_state['address'] = address
+
+    if not st.session_state['submit_button']:
+        with metrics.timer('base_map'):
+            show_map(base_map(), key='base_map')
+    return st.session_state.get('address')
+
+
+def unit_picker():
+    # Flat type of the submitted address, then the unit form built from its precomputed options.
+    # Returns (flat_type, year, storey_range, flat_model, floor_area) once the form is submitted,
+    # with the submitted flat type the form and features were built for, not the live selection
+    feature_table = load_feature_table()
+    flat_type = st.sidebar.selectbox("Flat Type", feature_table.flat_types(st.session_state['address']), placeholder="Choose an option", label_visibility="visible")
+
+    # When the user submits the flat_type
+    if st.sidebar.button("Select Flat Type", on_click=handle_flat_type_submit):
+        st.session_state['flat_type'] = flat_type
+    if not st.session_state['flat_type_submitted']:
+        return None
+
+    selected_key = (st.session_state['address'], st.session_state['flat_type'])
+    with st.sidebar.form(key='User Input HDB Features'):
+        # prediction_year
+        year = st.slider('Year', 2024, 2033, 2028)
+        # storey_range
+        storey_range = st.selectbox("Storey Range", feature_table.options(*selected_key, 'storey_range'), placeholder="Choose an option", label_visibility="visible")
+        # flat_model
+        flat_model = st.selectbox("Flat Model", feature_table.options(*selected_key, 'flat_model'), placeholder="Choose an option", label_visibility="visible")
+        # floor_area_sqm
+        floor_area = st.selectbox('Floor Area (sqm)', feature_table.options(*selected_key, 'floor_area_sqm'), placeholder="Choose an option", label_visibility="visible")
+
+        submit_button = st.form_submit_button(label = 'Submit')
+
+        if submit_button and not st.session_state.submit_button:
+            st.session_state.submit_button = True
+
+    if not st.session_state.submit_button:
+        return None
+    return st.session_state['flat_type'], year, storey_range, flat_model, floor_area
+
+
+def unit_features(flat_type, year, storey_range, floor_area, flat_model):
+    # Precomputed features of the submitted (address, flat_type) and the prediction params of the unit
+    with metrics.timer('features'):
+        features = load_feature_table().lookup(st.session_state['address'], st.session_state.get('flat_type'))
+    if features is None:
+        st.warning("Select a flat type for this address")
+        st.stop()
+    params = prediction_params(year, features['town'], flat_type, storey_range, floor_area, flat_model,
+                               features['lease_commence_date'], features['max_floor_lvl'], features['closest_mrt'],
+                               features['walking_time_mrt'])
+    return features, params
+
+
+def predict(params, forecast=False, base_url=None):
+    # The predicted price, or (price, yearly forecast) with forecast=True, from the configured
+    # predictor; the remote backend calls both endpoints concurrently. Stops the page on failure.
+    # requests and the rest of the prediction client are only imported once a valuation is asked for
+    from hdb.predictor import PredictionError, load_predictor
+    predictor = load_predictor(base_url)
+    metrics.increment('predictions')
+    try:
+        with metrics.timer('predict'):
+            return predictor.predict_all(params) if forecast else predictor.predict(params)
+    except PredictionError:
+        metrics.increment('prediction_errors')
+        st.error("Error: Could not retrieve prediction")
+        st.stop()
+
+
+def show_recent_transactions(address, flat_type):
+    st.header('Recent Transactions')
+    st.subheader(f'{address.title()}')
+    with metrics.timer('recent_transactions'):
+        recent_trans = load_transaction_store().recent_transactions(address, flat_type)
+    if not recent_trans.empty:
+        recent_trans['Year'] = pd.DatetimeIndex(recent_trans['Date Sold']).year.astype(str)
+        recent_trans['Month'] = pd.DatetimeIndex(recent_trans['Date Sold']).month
+        recent_trans['Month'] = pd.to_datetime(recent_trans['Month'], format='%m').dt.strftime('%b')
+        st.dataframe(recent_trans, column_order=('Year', 'Month', 'Flat Type', 'Storey Range', 'Floor Area (sqm)', 'Resale Price'), hide_index=True, use_container_width=True)
+    else:
+        st.write("No recent transactions found")
+    st.write('---')
+
+
+def show_proximity_map(address, nearby=False):
+    # Nearest MRT and the proximity map; with nearby=True also the nearest stations and the number
+    # of blocks within the circle
+    address_info = load_address_index().lookup(address)
+
+    st.header('Proximity Map')
+    st.write(f'The nearest MRT is: **{address_info.closest_mrt}**')
+    st.write(f'Walking time to the nearest MRT is: **{round(address_info.walking_time_mrt/60)} minutes**')
+    if nearby:
+        spatial_index = load_spatial_index()
+        with metrics.timer('spatial'):
+            nearby_stations = spatial_index.nearest_stations(address_info.hdb_lat, address_info.hdb_lon, k=3)
+            nearby_blocks, _ = spatial_index.addresses_within(address, PROXIMITY_RADIUS)
+        st.write('Nearby MRT stations: ' + ', '.join(f'**{station.name.title()}** ({round(station.distance_m)} m)' for station in nearby_stations))
+        st.write(f'Other HDB blocks within {PROXIMITY_RADIUS}m: **{len(nearby_blocks) - 1}**')
+    st.markdown('''*The circle shows everything within 500m walking distance*''')
+    with metrics.timer('proximity_map'):
+        show_map(proximity_map(address), key='proximity_map')
@@ -0,0 +1,137 @@
+# Loads the HDB datasets once per process and shares them across sessions.
+import hashlib
+import os
+
+import pandas as pd
+import streamlit as st
+from pandas.api.types import union_categoricals
+
+from hdb import artifacts, config
+
+UNIQUE_INFO_PATH = 'hdb_unique_info.csv'
+TRANSACTIONS_PATH = 'final_HDB_for_model.parquet.gzip'
+# Monthly sales appended by hdb.ingest, partitioned as sold_year=<year>/town=<town>/part-*.parquet
+TRANSACTIONS_DIR = 'data/transactions'
+
+# Only the columns the apps actually read are kept in memory
+UNIQUE_INFO_COLUMNS = ['address', 'town', 'flat_type', 'storey_range', 'flat_model', 'floor_area_sqm',
+                       'lease_commence_date', 'max_floor_lvl', 'HDB_lat', 'HDB_lon',
+                       'most_closest_mrt', 'mrt_lat', 'mrt_lon', 'MRT', 'walking_time_mrt']
+TRANSACTION_COLUMNS = ['address', 'town', 'flat_type', 'storey_range', 'floor_area_sqm',
+                       'lease_commence_date', 'sold_year', 'sold_year_month', 'resale_price']
+
+CATEGORICAL_COLUMNS = ['address', 'town', 'flat_type', 'storey_range', 'flat_model', 'most_closest_mrt', 'MRT']
+# Float columns that never reach the prediction API or the map, so float32 is precise enough
+FLOAT32_COLUMNS = ['resale_price']
+
+# Order the transaction table is kept in, so lookups can slice contiguous (address, flat_type) runs
+TRANSACTION_ORDER = ['address', 'flat_type', 'sold_year_month']
+
+# Content hash of each file by path, with the (mtime, size) it was computed at
+_digests = {}
+
+
+def file_signature(path, use_hash=config.DATA_HASH):
+    stat = os.stat(path)
+    if not use_hash:
+        return (stat.st_mtime_ns, stat.st_size)
+    # The file is only hashed again once its mtime or size changes, not on every load_* call
+    cached = _digests.get(path)
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return (cached[1], stat.st_size)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    _digests[path] = ((stat.st_mtime_ns, stat.st_size), digest.hexdigest())
+    return (digest.hexdigest(), stat.st_size)
+
+
+def source_signature(path):
+    # Recorded in the artifacts built offline: by content, so it survives copying the source file
+    return list(file_signature(path, use_hash=True))
+
+
+def optimise_dtypes(df):
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = df[col].astype('category')
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        elif col in FLOAT32_COLUMNS and pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype('float32')
+    return df
+
+
+def read_unique_info(path=UNIQUE_INFO_PATH):
+    df = pd.read_csv(path, usecols=lambda col: col in UNIQUE_INFO_COLUMNS)
+    return optimise_dtypes(df)
+
+
+def read_transactions(path=TRANSACTIONS_PATH):
+    df = pd.read_parquet(path, columns=TRANSACTION_COLUMNS)
+    # Snapshot and ingested partitions must agree on the type to sort and concatenate together
+    df['sold_year_month'] = pd.to_datetime(df['sold_year_month'])
+    return optimise_dtypes(df)
+
+
+def partition_files(directory=TRANSACTIONS_DIR):
+    files = []
+    for root, _, names in os.walk(directory):
+        files.extend(os.path.join(root, name) for name in names if name.endswith('.parquet'))
+    return sorted(files)
+
+
+def concat_frames(frames):
+    # Concatenates while keeping categorical columns categorical (plain pd.concat falls back to
+    # object when the categories differ)
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    result = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            result[col] = union_categoricals([frame[col].astype('category') for frame in frames], sort_categories=True)
+    return result
+
+
+def read_sorted_transactions(path=TRANSACTIONS_PATH):
+    return read_transactions(path).sort_values(TRANSACTION_ORDER, kind='stable', ignore_index=True)
+
+
+def read_shared(name, path, signature, read):
+    # Maps the exported copy of a table when it was exported from this version of the source file.
+    # Otherwise the table is read and exported once, and the exported copy is mapped in its place
+    # so even the first process holds no private copy
+    if not config.SHARED_DATA_PATH:
+        return read(path)
+    directory = os.path.join(config.SHARED_DATA_PATH, name)
+    try:
+        if artifacts.load_meta(directory).get('source_signature') == list(signature):
+            return artifacts.load_frame(directory)
+    except (FileNotFoundError, ValueError):
+        pass
+    df = read(path)
+    try:
+        artifacts.save_frame(df, directory, source_signature=list(signature))
+        return artifacts.load_frame(directory)
+    except OSError:
+        # Read-only deployment, or another process swapped in its export at the same moment
+        return df
+
+
+# The signature is part of the cache key, so a changed file is reloaded on the next rerun
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_unique_info(path, signature):
+    return read_shared('unique_info', path, signature, read_unique_info)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_transactions(path, signature):
+    return read_shared('transactions', path, signature, read_sorted_transactions)
+
+
+def load_unique_info(path=UNIQUE_INFO_PATH):
+    return _load_unique_info(path, file_signature(path))
+
+
+def load_transactions(path=TRANSACTIONS_PATH):
+    return _load_transactions(path, file_signature(path))
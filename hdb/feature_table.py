@@ -0,0 +1,122 @@
+# Per-(address, flat_type) features and sidebar options, materialized offline and loaded memory-mapped.
+# Usage: python -m hdb.feature_table [--source hdb_unique_info.csv] [--output artifacts/features]
+import argparse
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from hdb import artifacts, config, data
+from hdb.features import FEATURE_KEYS, address_features
+
+OPTION_COLUMNS = ['storey_range', 'flat_model', 'floor_area_sqm']
+
+
+class FeatureTable:
+    def __init__(self, features, options, source_signature=None):
+        # features: one row per (address, flat_type), with <column>_start/<column>_stop offsets
+        # into the sorted option values held in options[<column>]
+        self.features = features
+        self.options_values = options
+        self.source_signature = source_signature
+        addresses = features['address'].astype(str).to_numpy()
+        flat_types = features['flat_type'].astype(str).to_numpy()
+        self._row = {key: i for i, key in enumerate(zip(addresses, flat_types))}
+        self._flat_types = {}
+        for address, flat_type in zip(addresses, flat_types):
+            self._flat_types.setdefault(address, []).append(flat_type)
+        self._town = features['town'].astype(str).to_numpy()
+        self._closest_mrt = features['closest_mrt'].astype(str).to_numpy()
+        self._max_floor_lvl = features['max_floor_lvl'].to_numpy()
+        self._lease_commence_date = features['lease_commence_date'].to_numpy()
+        self._walking_time_mrt = features['walking_time_mrt'].to_numpy()
+
+    @classmethod
+    def build(cls, unique_info, source_signature=None):
+        features = address_features(unique_info).sort_values(FEATURE_KEYS, ignore_index=True)
+        row = features.set_index(FEATURE_KEYS).index
+        options = {}
+        for column in OPTION_COLUMNS:
+            pairs = unique_info[FEATURE_KEYS + [column]].drop_duplicates()
+            positions = row.get_indexer(pd.MultiIndex.from_frame(pairs[FEATURE_KEYS]))
+            pairs = pairs.assign(row=positions).sort_values(['row', column])
+            counts = np.bincount(pairs['row'].to_numpy(), minlength=len(features))
+            stops = np.cumsum(counts)
+            features[f'{column}_start'] = stops - counts
+            features[f'{column}_stop'] = stops
+            options[column] = pairs[column].astype(str if column != 'floor_area_sqm' else 'float64').to_numpy()
+        return cls(features, options, source_signature)
+
+    def save(self, directory):
+        frames = {'features': self.features}
+        frames.update({column: pd.DataFrame({'value': values}) for column, values in self.options_values.items()})
+        artifacts.save_frames(frames, directory, source_signature=self.source_signature)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        frames = artifacts.load_frames(directory, mmap)
+        options = {column: np.asarray(frames[column]['value']) for column in OPTION_COLUMNS}
+        return cls(frames['features'], options, artifacts.load_meta(directory).get('source_signature'))
+
+    def __contains__(self, key):
+        return key in self._row
+
+    def flat_types(self, address):
+        return self._flat_types.get(address, [])
+
+    def lookup(self, address, flat_type):
+        i = self._row.get((address, flat_type))
+        if i is None:
+            return None
+        return {
+            'town': self._town[i],
+            'max_floor_lvl': float(self._max_floor_lvl[i]),
+            'lease_commence_date': int(self._lease_commence_date[i]),
+            'closest_mrt': self._closest_mrt[i],
+            'walking_time_mrt': float(self._walking_time_mrt[i]),
+        }
+
+    def options(self, address, flat_type, column):
+        i = self._row.get((address, flat_type))
+        if i is None:
+            return []
+        start = self.features[f'{column}_start'].iat[i]
+        stop = self.features[f'{column}_stop'].iat[i]
+        return self.options_values[column][start:stop].tolist()
+
+
+def read_feature_table(path=data.UNIQUE_INFO_PATH, unique_info=None):
+    # Use the prebuilt artifact when it was built from this exact file, otherwise build in memory
+    expected = data.source_signature(path)
+    try:
+        table = FeatureTable.load(config.FEATURE_TABLE_PATH)
+        if table.source_signature == expected:
+            return table
+    except FileNotFoundError:
+        pass
+    if unique_info is None:
+        unique_info = data.read_unique_info(path)
+    return FeatureTable.build(unique_info, expected)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_feature_table(path, signature):
+    return read_feature_table(path, data._load_unique_info(path, signature))
+
+
+def load_feature_table(path=data.UNIQUE_INFO_PATH):
+    return _load_feature_table(path, data.file_signature(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the per-(address, flat_type) feature table')
+    parser.add_argument('--source', default=data.UNIQUE_INFO_PATH)
+    parser.add_argument('--output', default=config.FEATURE_TABLE_PATH)
+    args = parser.parse_args(argv)
+    table = FeatureTable.build(data.read_unique_info(args.source), data.source_signature(args.source))
+    table.save(args.output)
+    print(f'Wrote {len(table.features):,} (address, flat_type) rows to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
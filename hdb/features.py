@@ -0,0 +1,91 @@
+# Derives the model inputs for an (address, flat_type) and builds the query parameters shared
+# by the /predict and /fullpredict endpoints.
+import numpy as np
+import pandas as pd
+
+FORECAST_YEARS = range(2024, 2034)
+DEFAULT_YEAR = 2028
+
+FEATURE_KEYS = ['address', 'flat_type']
+
+# Typed result of a multi-year forecast, usable as a plotly/pandas source as is
+FORECAST_DTYPE = np.dtype([('sold_year', np.int32), ('forecast', np.float64)])
+
+PARAM_NAMES = ['year', 'town', 'flat_type', 'storey_range', 'floor_area_sqm', 'flat_model', 'lease_commence_date',
+               'sold_remaining_lease', 'max_floor_lvl', 'most_closest_mrt', 'walking_time_mrt']
+
+
+def remaining_lease(year, lease_commence_date):
+    return 99 - (year - lease_commence_date)
+
+
+def prediction_params(year, town, flat_type, storey_range, floor_area, flat_model, lease_commence_date,
+                      max_floor_lvl, closest_mrt, walking_time_mrt):
+    return {
+        'year': year,
+        'town': town,
+        'flat_type': flat_type,
+        'storey_range': storey_range,
+        'floor_area_sqm': floor_area,
+        'flat_model': flat_model,
+        'lease_commence_date': lease_commence_date,
+        'sold_remaining_lease': remaining_lease(year, lease_commence_date),
+        'max_floor_lvl': max_floor_lvl,
+        'most_closest_mrt': closest_mrt,
+        'walking_time_mrt': walking_time_mrt,
+    }
+
+
+def horizon_frame(params, years=FORECAST_YEARS):
+    # One row per forecast year, with the year and remaining lease varied per row
+    years = np.asarray(years, dtype=np.int64)
+    frame = pd.DataFrame({name: [params[name]] * len(years) for name in PARAM_NAMES}, columns=PARAM_NAMES)
+    frame['year'] = years
+    frame['sold_remaining_lease'] = remaining_lease(years, int(params['lease_commence_date']))
+    return frame
+
+
+def forecast_array(years, forecasts):
+    result = np.empty(len(years), dtype=FORECAST_DTYPE)
+    result['sold_year'] = years
+    result['forecast'] = forecasts
+    return result
+
+
+def group_mode(df, keys, column):
+    # Most frequent value per group, ties broken like Series.mode()[0] (smallest value wins)
+    counts = df.groupby(keys + [column], observed=True).size().reset_index(name='count')
+    counts = counts.sort_values(keys + ['count', column], ascending=[True] * len(keys) + [False, True])
+    return counts.drop_duplicates(keys).set_index(keys)[column]
+
+
+def address_features(unique_info):
+    # The per-submit reductions of the apps, computed for every (address, flat_type) at once
+    grouped = unique_info.groupby(FEATURE_KEYS, observed=True)
+    features = pd.DataFrame({
+        'town': group_mode(unique_info, FEATURE_KEYS, 'town'),
+        'max_floor_lvl': grouped['max_floor_lvl'].mean(),
+        'lease_commence_date': grouped['lease_commence_date'].mean().astype('int64'),
+        'closest_mrt': group_mode(unique_info, FEATURE_KEYS, 'MRT'),
+        'walking_time_mrt': grouped['walking_time_mrt'].mean(),
+    })
+    return features.reset_index()
+
+
+def params_frame(rows):
+    # Vectorized prediction_params: rows needs year, town, flat_type, storey_range, floor_area_sqm,
+    # flat_model, lease_commence_date, max_floor_lvl, closest_mrt and walking_time_mrt columns
+    frame = pd.DataFrame({
+        'year': rows['year'].astype('int64'),
+        'town': rows['town'].astype(str),
+        'flat_type': rows['flat_type'].astype(str),
+        'storey_range': rows['storey_range'].astype(str),
+        'floor_area_sqm': rows['floor_area_sqm'].astype('float64'),
+        'flat_model': rows['flat_model'].astype(str),
+        'lease_commence_date': rows['lease_commence_date'].astype('int64'),
+        'max_floor_lvl': rows['max_floor_lvl'].astype('float64'),
+        'most_closest_mrt': rows['closest_mrt'].astype(str),
+        'walking_time_mrt': rows['walking_time_mrt'].astype('float64'),
+    }, index=rows.index)
+    frame['sold_remaining_lease'] = remaining_lease(frame['year'], frame['lease_commence_date'])
+    return frame[PARAM_NAMES]
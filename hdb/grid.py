@@ -0,0 +1,209 @@
+# Forecasts precomputed for every input combination the apps can submit, served from a
+# memory-mapped lookup so most submits need no model call.
+# Usage: python -m hdb.grid [--source hdb_unique_info.csv] [--output artifacts/forecast_grid]
+#                           [--api-url URL | --stub] [--workers 16]
+#
+# A combination is an (address, flat_type) row of the feature table crossed with its storey_range,
+# flat_model and floor_area_sqm options. Each is keyed by a 64-bit hash of its prediction
+# parameters (everything except the year), so lookups need only the params the apps already build.
+import argparse
+import hashlib
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from hdb import artifacts, config, data, metrics
+from hdb.cache import cache_key
+from hdb.client import PredictionClient
+from hdb.feature_table import OPTION_COLUMNS, read_feature_table
+from hdb.features import DEFAULT_YEAR, FORECAST_YEARS, forecast_array, prediction_params
+from hdb.predictor import PredictionError, RemotePredictor
+from hdb.stub_server import start_stub_server
+
+WORKERS = 16
+CHUNK_SIZE = 2000
+
+
+def grid_key(params):
+    # The year and remaining lease vary along the forecast, so they are not part of the key
+    key = cache_key('grid', {**params, 'year': None, 'sold_remaining_lease': None})
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+
+
+def grid_params(table, year=DEFAULT_YEAR):
+    # Every combination the sidebars offer, as prediction params
+    features = table.features
+    for address, flat_type in zip(features['address'].astype(str), features['flat_type'].astype(str)):
+        row = table.lookup(address, flat_type)
+        choices = [table.options(address, flat_type, column) for column in OPTION_COLUMNS]
+        for storey_range, flat_model, floor_area in itertools.product(*choices):
+            yield prediction_params(year, row['town'], flat_type, storey_range, floor_area, flat_model,
+                                    row['lease_commence_date'], row['max_floor_lvl'], row['closest_mrt'],
+                                    row['walking_time_mrt'])
+
+
+class ForecastGrid:
+    def __init__(self, keys, columns, years):
+        # keys: sorted uint64 hashes; columns: one float32 array of forecasts per year
+        self.keys = keys
+        self.columns = columns
+        self.years = np.asarray(years, dtype=np.int32)
+
+    @classmethod
+    def build(cls, params, forecast, workers=WORKERS, chunk_size=CHUNK_SIZE, progress=None):
+        # forecast(params) returns a forecast array or raises PredictionError; failed combinations are
+        # left out and fall through to the live predictor
+        years = np.asarray(FORECAST_YEARS, dtype=np.int32)
+        keys, rows = [], []
+
+        def fetch(item):
+            try:
+                result = forecast(item)
+            except PredictionError:
+                return None
+            return dict(zip(result['sold_year'].tolist(), result['forecast'].tolist()))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hdb-grid') as executor:
+            params = iter(params)
+            while True:
+                chunk = list(itertools.islice(params, chunk_size))
+                if not chunk:
+                    break
+                for item, result in zip(chunk, executor.map(fetch, chunk)):
+                    if result is not None:
+                        keys.append(grid_key(item))
+                        rows.append([result.get(int(year), np.nan) for year in years])
+                if progress is not None:
+                    progress(len(keys))
+        keys = np.asarray(keys, dtype=np.uint64)
+        values = np.asarray(rows, dtype=np.float32).reshape(len(keys), len(years))
+        # Identical params (e.g. repeated options) collapse to one entry
+        keys, first = np.unique(keys, return_index=True)
+        values = values[first]
+        return cls(keys, [values[:, i] for i in range(len(years))], years)
+
+    def save(self, directory, **meta):
+        frame = pd.DataFrame({'key': self.keys, **{str(year): column for year, column in zip(self.years, self.columns)}})
+        artifacts.save_frame(frame, directory, years=self.years.tolist(), **meta)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        frame = artifacts.load_frame(directory, mmap)
+        years = artifacts.load_meta(directory)['years']
+        return cls(frame['key'].to_numpy(), [frame[str(year)].to_numpy() for year in years], years)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def positions(self, keys):
+        # Row of each key, or -1 when it is not in the grid
+        keys = np.asarray(keys, dtype=np.uint64)
+        rows = np.searchsorted(self.keys, keys).clip(max=max(len(self.keys) - 1, 0))
+        found = (self.keys[rows] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        return np.where(found, rows, -1)
+
+    def forecast(self, params):
+        row = self.positions([grid_key(params)])[0]
+        if row < 0:
+            return None
+        # Stored as float32; rounded back to cents like the model outputs
+        return forecast_array(self.years, [round(float(column[row]), 2) for column in self.columns])
+
+
+def grid_model(directory):
+    # Identity of the model the grid was filled from (see predictor.model_identity)
+    try:
+        meta = artifacts.load_meta(directory)
+    except FileNotFoundError:
+        return None
+    return meta.get('model')
+
+
+class GridPredictor:
+    # Answers from the grid and passes anything it does not cover to the configured predictor
+    def __init__(self, grid, fallback):
+        self.grid = grid
+        self.fallback = fallback
+
+    def _lookup(self, params):
+        result = self.grid.forecast(params)
+        metrics.increment('grid_hits' if result is not None else 'grid_misses')
+        return result
+
+    def forecast(self, params):
+        result = self._lookup(params)
+        return result if result is not None else self.fallback.forecast(params)
+
+    def full_predict(self, params):
+        result = self._lookup(params)
+        if result is None:
+            return self.fallback.full_predict(params)
+        return {str(i): {'sold_year': int(row['sold_year']), 'forecast': float(row['forecast'])}
+                for i, row in enumerate(result)}
+
+    def _year_value(self, forecast, year):
+        match = np.flatnonzero(forecast['sold_year'] == int(year))
+        return float(forecast['forecast'][match[0]]) if len(match) else None
+
+    def predict(self, params):
+        result = self._lookup(params)
+        value = self._year_value(result, params['year']) if result is not None else None
+        return value if value is not None else self.fallback.predict(params)
+
+    def predict_all(self, params):
+        result = self._lookup(params)
+        value = self._year_value(result, params['year']) if result is not None else None
+        if value is None:
+            return self.fallback.predict_all(params)
+        return value, result
+
+    def predict_many(self, frame):
+        # Rows in the grid are answered from it directly; the rest go to the fallback together
+        rows = self.grid.positions([grid_key(params) for params in frame.to_dict('records')])
+        columns = {int(year): column for year, column in zip(self.grid.years, self.grid.columns)}
+        years = frame['year'].to_numpy(dtype=np.int64)
+        results = np.full(len(frame), np.nan)
+        for i in np.flatnonzero(rows >= 0):
+            column = columns.get(int(years[i]))
+            if column is not None:
+                results[i] = round(float(column[rows[i]]), 2)
+        miss = np.isnan(results)
+        metrics.increment('grid_hits', int((~miss).sum()))
+        metrics.increment('grid_misses', int(miss.sum()))
+        if miss.any():
+            results[miss] = self.fallback.predict_many(frame[miss])
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute forecasts for every input combination')
+    parser.add_argument('--source', default=data.UNIQUE_INFO_PATH)
+    parser.add_argument('--output', default=config.FORECAST_GRID_PATH)
+    parser.add_argument('--api-url', default=config.API_URL, help='prediction API serving /fullpredict')
+    parser.add_argument('--stub', action='store_true', help='fill the grid from a local stub API (for testing)')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.stub:
+        server, args.api_url = start_stub_server()
+    client = PredictionClient(args.api_url, pool_size=args.workers)
+    predictor = RemotePredictor(client)
+    table = read_feature_table(args.source)
+    start = time.perf_counter()
+    try:
+        grid = ForecastGrid.build(grid_params(table), predictor.forecast, args.workers,
+                                  progress=lambda done: print(f'{done:,} combinations forecast'))
+    finally:
+        client.close()
+        if server is not None:
+            server.shutdown()
+    grid.save(args.output, api_url=args.api_url, model=args.api_url.rstrip('/'), source_signature=table.source_signature)
+    print(f'Wrote {len(grid):,} forecasts to {args.output} in {time.perf_counter() - start:.0f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Appends new monthly resale records to the partitioned transaction store and updates the
+# per-address info derived from them. Running apps pick up the new partitions on their next rerun.
+# Usage: python -m hdb.ingest resale_records.csv [--unique-info hdb_unique_info.csv] [--partitions-dir data/transactions]
+#        [--transactions final_HDB_for_model.parquet.gzip]
+import argparse
+import os
+import time
+from urllib.parse import quote
+
+import pandas as pd
+
+from hdb import config, data
+from hdb.feature_table import FeatureTable
+
+RECORD_COLUMNS = ['address', 'town', 'flat_type', 'storey_range', 'floor_area_sqm', 'flat_model',
+                  'lease_commence_date', 'sold_year_month', 'resale_price']
+# A sale is the same sale if all of these match
+DEDUPE_COLUMNS = ['address', 'flat_type', 'storey_range', 'floor_area_sqm', 'sold_year_month', 'resale_price']
+# Types the columns are compared in, whichever file they were read from
+DEDUPE_TYPES = {'address': str, 'flat_type': str, 'storey_range': str, 'floor_area_sqm': 'float64',
+                'sold_year_month': 'datetime64[ns]', 'resale_price': 'float64'}
+# Per-block fields copied from the block's existing rows when a new combination appears
+BLOCK_COLUMNS = ['HDB_lat', 'HDB_lon', 'most_closest_mrt', 'mrt_lat', 'mrt_lon', 'MRT', 'walking_time_mrt', 'max_floor_lvl']
+UNIT_COLUMNS = ['address', 'flat_type', 'storey_range', 'flat_model', 'floor_area_sqm']
+
+
+def read_records(path):
+    records = pd.read_parquet(path) if path.endswith(('.parquet', '.gzip')) else pd.read_csv(path)
+    missing = [col for col in RECORD_COLUMNS if col not in records.columns]
+    if missing:
+        raise ValueError(f'Missing columns: {", ".join(missing)}')
+    records = records[RECORD_COLUMNS].copy()
+    for col in ['address', 'town', 'flat_type', 'storey_range', 'flat_model']:
+        records[col] = records[col].astype(str).str.strip()
+    records['sold_year_month'] = pd.to_datetime(records['sold_year_month'])
+    records['sold_year'] = records['sold_year_month'].dt.year
+    return records.drop_duplicates(DEDUPE_COLUMNS)
+
+
+def partition_dir(partitions_dir, sold_year, town):
+    # Town names such as KALLANG/WHAMPOA are quoted so they stay one path segment
+    return os.path.join(partitions_dir, f'sold_year={sold_year}', f'town={quote(town, safe=" ")}')
+
+
+def stored(rows, stored_rows):
+    # Whether each row is a sale already in stored_rows
+    keys = [frame[DEDUPE_COLUMNS].assign(sold_year_month=pd.to_datetime(frame['sold_year_month'])).astype(DEDUPE_TYPES)
+            for frame in (rows, stored_rows)]
+    return (keys[0].merge(keys[1].drop_duplicates(), how='left', indicator=True)['_merge'] == 'both').to_numpy()
+
+
+def drop_snapshot_sales(records, path=data.TRANSACTIONS_PATH):
+    # Drops sales the snapshot already holds, comparing against its rows in the months being ingested
+    if not os.path.exists(path):
+        return records
+    snapshot = pd.read_parquet(path, columns=DEDUPE_COLUMNS)
+    snapshot = snapshot[pd.to_datetime(snapshot['sold_year_month']).isin(records['sold_year_month'].unique())]
+    return records[~stored(records, snapshot)]
+
+
+def append_partitions(records, partitions_dir=data.TRANSACTIONS_DIR, transactions_path=data.TRANSACTIONS_PATH):
+    # Writes one new file per (sold_year, town), skipping sales already in the snapshot or stored in
+    # that partition
+    stamp = time.strftime('%Y%m%dT%H%M%S')
+    written = 0
+    records = drop_snapshot_sales(records, transactions_path)
+    for (sold_year, town), rows in records.groupby(['sold_year', 'town']):
+        directory = partition_dir(partitions_dir, sold_year, town)
+        existing = data.partition_files(directory)
+        if existing:
+            rows = rows[~stored(rows, pd.concat([pd.read_parquet(path, columns=DEDUPE_COLUMNS) for path in existing]))]
+        if rows.empty:
+            continue
+        os.makedirs(directory, exist_ok=True)
+        # Written under a temporary name first, so a running app never reads a partial file
+        path = os.path.join(directory, f'part-{stamp}-{os.getpid()}.parquet')
+        rows.to_parquet(f'{path}.tmp', index=False)
+        os.replace(f'{path}.tmp', path)
+        written += len(rows)
+    return written
+
+
+def update_unique_info(records, path=data.UNIQUE_INFO_PATH):
+    # Appends unit combinations not seen before for known blocks, copying the block's geo and
+    # MRT fields. Sales at unknown blocks need geocoding first, so they are only counted
+    unique_info = pd.read_csv(path)
+    blocks = unique_info.drop_duplicates('address').set_index('address')[BLOCK_COLUMNS]
+    units = records.drop_duplicates(UNIT_COLUMNS)
+    known = units['address'].isin(blocks.index)
+    seen = units[UNIT_COLUMNS].merge(unique_info[UNIT_COLUMNS].drop_duplicates(), how='left', indicator=True)['_merge'] == 'both'
+    new_units = units[known.to_numpy() & ~seen.to_numpy()]
+    if not new_units.empty:
+        new_rows = new_units[['address', 'town', 'lease_commence_date'] + UNIT_COLUMNS[1:]].join(blocks, on='address')
+        new_rows.reindex(columns=unique_info.columns).to_csv(path, mode='a', header=False, index=False)
+    return len(new_units), units.loc[~known.to_numpy(), 'address'].nunique()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest new HDB resale records')
+    parser.add_argument('records', help='CSV or Parquet with ' + ', '.join(RECORD_COLUMNS))
+    parser.add_argument('--unique-info', default=data.UNIQUE_INFO_PATH)
+    parser.add_argument('--partitions-dir', default=data.TRANSACTIONS_DIR)
+    parser.add_argument('--transactions', default=data.TRANSACTIONS_PATH, help='snapshot checked for sales already stored')
+    args = parser.parse_args(argv)
+
+    records = read_records(args.records)
+    written = append_partitions(records, args.partitions_dir, args.transactions)
+    new_units, unknown_blocks = update_unique_info(records, args.unique_info)
+    print(f'Appended {written:,} of {len(records):,} sales to {args.partitions_dir}')
+    print(f'Added {new_units:,} new unit combinations to {args.unique_info}')
+    if unknown_blocks:
+        print(f'Skipped unit info for {unknown_blocks:,} blocks missing from {args.unique_info}; geocode and add them first')
+    # The feature table is derived from the unit info, so refresh it if one was built
+    if new_units and os.path.exists(config.FEATURE_TABLE_PATH):
+        FeatureTable.build(data.read_unique_info(args.unique_info), data.source_signature(args.unique_info)).save(config.FEATURE_TABLE_PATH)
+        print(f'Rebuilt {config.FEATURE_TABLE_PATH}')
+
+
+if __name__ == '__main__':
+    main()
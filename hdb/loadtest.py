@@ -0,0 +1,202 @@
+# Headless load test: simulated sessions walk an app's address -> flat type -> submit flow through
+# streamlit's AppTest, in parallel worker processes, against the local stub prediction API.
+# Usage: python -m hdb.loadtest [--app streamlit_app.py] [--sessions 40] [--concurrency 8] [--delay 0.05]
+#
+# Run it from the directory holding the datasets, as for the apps. Sessions use the page the app
+# opens on, which must use the configured API URL (app.py opens on the Price Estimator page, which
+# calls its own endpoint, and is not supported).
+#
+# AppTest installs a process-wide mock runtime for each run, so two runs cannot overlap in one
+# process. Each concurrent session therefore runs in its own worker process: --concurrency sessions
+# are in flight at once, as on that many single-user replicas mapping the shared dataset exports.
+# The GIL contention between sessions of one server process is not part of the measurement.
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import time
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from hdb import config, data
+from hdb.session import memory_report
+from hdb.stub_server import start_stub_server
+
+APP_PATH = 'streamlit_app.py'
+SESSIONS = 40
+CONCURRENCY = 8
+TIMEOUT = 120
+
+
+class SessionError(Exception):
+    pass
+
+
+def resident_memory():
+    # Current resident set size in bytes (peak size where /proc is unavailable)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _find(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    return None
+
+
+def run_session(app_path, address, timeout=TIMEOUT):
+    # One user: open the app, search and pick the address, pick the first flat type, submit.
+    # Returns (step, latency) for each rerun and the size of the session state at the end
+    # AppTest resolves relative paths against the calling module, not the working directory
+    at = AppTest.from_file(os.path.abspath(app_path), default_timeout=timeout)
+    steps = []
+
+    def step(name, action):
+        start = time.perf_counter()
+        action()
+        steps.append((name, time.perf_counter() - start))
+        if at.exception:
+            raise SessionError(f'{name}: {at.exception[0].message}')
+
+    step('open', at.run)
+    step('search', lambda: _find(at.sidebar.text_input, 'Search Address').input(address).run())
+    step('select_address', lambda: _find(at.sidebar.selectbox, 'Address').select(address).run())
+    step('submit_address', lambda: at.sidebar.button[0].click().run())
+    flat_type_button = _find(at.sidebar.button, 'Select Flat Type')
+    if flat_type_button is not None:
+        step('select_flat_type', lambda: flat_type_button.click().run())
+    submit = _find(at.sidebar.button, 'Submit')
+    if submit is None:
+        raise SessionError('no Submit button after selecting the address')
+    step('submit', lambda: submit.click().run())
+    # Keys starting with $$ are AppTest's own bookkeeping
+    state = {key: at.session_state[key] for key in at.session_state if not key.startswith('$$')}
+    return steps, int(memory_report(state)['bytes'].sum())
+
+
+def percentiles(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if len(values) else (np.nan,) * 3
+    return {'count': len(values), 'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000}
+
+
+def _worker(app_path, url, warm_up_address, tasks, results, start):
+    # Runs sessions for addresses from tasks until it gets None. A warm-up session first loads the
+    # datasets, so loading is not counted against the first users
+    config.API_URL = url
+    try:
+        run_session(app_path, warm_up_address)
+    except (SessionError, RuntimeError) as e:
+        results.put(('failed', str(e)))
+        return
+    results.put(('ready', resident_memory()))
+    start.wait()
+    for address in iter(tasks.get, None):
+        try:
+            results.put(('session', run_session(app_path, address)))
+        except (SessionError, RuntimeError) as e:
+            results.put(('error', str(e)))
+    results.put(('done', resident_memory()))
+
+
+def run_load_test(app_path=APP_PATH, sessions=SESSIONS, concurrency=CONCURRENCY, delay=0.0, seed=0,
+                  timeout=TIMEOUT):
+    server, url = start_stub_server(delay=delay)
+    addresses = data.read_unique_info()['address'].astype(str).unique()
+    chosen = [str(address) for address in np.random.default_rng(seed).choice(addresses, sessions)]
+
+    # Spawned rather than forked, so workers do not inherit the stub server's threads
+    context = multiprocessing.get_context('spawn')
+    tasks, results, start_event = context.Queue(), context.Queue(), context.Event()
+    workers = [context.Process(target=_worker, args=(app_path, url, chosen[0], tasks, results, start_event),
+                               daemon=True, name=f'hdb-loadtest-{i}') for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+
+    def receive():
+        try:
+            return results.get(timeout=timeout * 10)
+        except queue.Empty:
+            raise RuntimeError('a load test worker stopped responding') from None
+
+    steps, session_bytes, errors = [], [], []
+    try:
+        rss_before = 0
+        for _ in workers:
+            kind, value = receive()
+            if kind == 'failed':
+                raise RuntimeError(f'warm-up session failed: {value}')
+            rss_before += value
+        for address in chosen:
+            tasks.put(address)
+        for _ in workers:
+            tasks.put(None)
+        start = time.perf_counter()
+        start_event.set()
+        rss_after, finished = 0, 0
+        while finished < len(workers):
+            kind, value = receive()
+            if kind == 'session':
+                session_steps, size = value
+                steps.extend(session_steps)
+                session_bytes.append(size)
+            elif kind == 'error':
+                errors.append(value)
+            else:
+                rss_after += value
+                finished += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        server.shutdown()
+    completed = len(session_bytes)
+
+    names = list(dict.fromkeys(name for name, _ in steps))
+    return {
+        'app': app_path, 'sessions': sessions, 'concurrency': concurrency, 'stub_delay_s': delay,
+        'completed': completed, 'errors': errors, 'elapsed_s': elapsed,
+        'sessions_per_s': completed / elapsed, 'reruns_per_s': len(steps) / elapsed,
+        'rerun': percentiles([latency for _, latency in steps]),
+        'steps': {name: percentiles([latency for step, latency in steps if step == name]) for name in names},
+        'session_state_bytes': float(np.mean(session_bytes)) if session_bytes else 0.0,
+        'rss_growth_per_session_bytes': (rss_after - rss_before) / max(completed, 1),
+        'rss_bytes': rss_after,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate concurrent users of an app headlessly')
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--sessions', type=int, default=SESSIONS)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY,
+                        help='sessions in flight at once, each in its own worker process')
+    parser.add_argument('--delay', type=float, default=0.0, help='stub API latency in seconds')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.app, args.sessions, args.concurrency, args.delay)
+    print(f'{report["completed"]}/{report["sessions"]} sessions in {report["elapsed_s"]:.1f}s at concurrency '
+          f'{report["concurrency"]}: {report["sessions_per_s"]:.2f} sessions/s, {report["reruns_per_s"]:.2f} reruns/s')
+    rows = [('all reruns', report['rerun'])] + list(report['steps'].items())
+    for name, stats in rows:
+        print(f'  {name:<18} p50 {stats["p50_ms"]:8.1f} ms   p95 {stats["p95_ms"]:8.1f} ms   p99 {stats["p99_ms"]:8.1f} ms')
+    print(f'  session state {report["session_state_bytes"]:,.0f} bytes/session, resident memory '
+          f'{report["rss_bytes"] / 2**20:,.0f} MiB across workers ({report["rss_growth_per_session_bytes"] / 2**10:+,.0f} KiB/session)')
+    for error in report['errors'][:5]:
+        print(f'  error: {error}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# Address-keyed index over the per-block geo and MRT fields of hdb_unique_info.csv.
+from collections import namedtuple
+
+import numpy as np
+import streamlit as st
+
+from hdb import data
+
+AddressInfo = namedtuple('AddressInfo', ['hdb_lat', 'hdb_lon', 'closest_mrt', 'mrt_lat', 'mrt_lon', 'walking_time_mrt'])
+
+
+class AddressIndex:
+    def __init__(self, df):
+        # First row per address, matching the old df[df['address'] == address].iloc[0] lookups
+        first = df.drop_duplicates('address')
+        self.addresses = first['address'].astype(str).to_numpy()
+        self._position = {address: i for i, address in enumerate(self.addresses)}
+        self.hdb_lat = first['HDB_lat'].to_numpy(dtype=np.float64)
+        self.hdb_lon = first['HDB_lon'].to_numpy(dtype=np.float64)
+        self.closest_mrt = first['most_closest_mrt'].astype(str).to_numpy()
+        self.mrt_lat = first['mrt_lat'].to_numpy(dtype=np.float64)
+        self.mrt_lon = first['mrt_lon'].to_numpy(dtype=np.float64)
+        self.walking_time_mrt = first['walking_time_mrt'].to_numpy(dtype=np.float64)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __contains__(self, address):
+        return address in self._position
+
+    def position(self, address):
+        return self._position.get(address)
+
+    def lookup(self, address):
+        i = self._position.get(address)
+        if i is None:
+            return None
+        return AddressInfo(float(self.hdb_lat[i]), float(self.hdb_lon[i]), self.closest_mrt[i],
+                           float(self.mrt_lat[i]), float(self.mrt_lon[i]), float(self.walking_time_mrt[i]))
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_address_index(path, signature):
+    return AddressIndex(data._load_unique_info(path, signature))
+
+
+def load_address_index(path=data.UNIQUE_INFO_PATH):
+    return _build_address_index(path, data.file_signature(path))
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_address_rows(path, signature):
+    # Row positions of every address in the shared table
+    df = data._load_unique_info(path, signature)
+    return {str(address): positions for address, positions in df.groupby('address', observed=True).indices.items()}
+
+
+def address_rows(address, path=data.UNIQUE_INFO_PATH):
+    # All rows of one address, sliced from the shared table on demand instead of kept per session
+    signature = data.file_signature(path)
+    df = data._load_unique_info(path, signature)
+    positions = _build_address_rows(path, signature).get(address)
+    return df.iloc[positions] if positions is not None else df.iloc[:0]
@@ -0,0 +1,50 @@
+# Folium maps shared across sessions: the Singapore overview is built once per process and
+# per-address proximity maps are kept in a bounded cache keyed by address.
+# folium and streamlit_folium are imported on first use: together they take most of a second to
+# import and the apps draw their header and address picker before any map.
+import streamlit as st
+
+from hdb import config
+from hdb.lookup import load_address_index
+from hdb.spatial import load_spatial_index
+
+MAP_CENTER = [1.3521, 103.8198]
+MAP_WIDTH = 725
+MAP_HEIGHT = 484
+PROXIMITY_RADIUS = 500
+NEARBY_STATIONS = 3
+
+
+@st.cache_resource(show_spinner=False)
+def base_map():
+    import folium
+    return folium.Map(location=MAP_CENTER, zoom_start=11.4)
+
+
+def build_proximity_map(address, address_info, spatial_index):
+    import folium
+    m = folium.Map(location=[address_info.hdb_lat, address_info.hdb_lon], zoom_start=16)
+    # Other blocks within the circle
+    addresses, distances = spatial_index.addresses_within(address, PROXIMITY_RADIUS)
+    for nearby, distance in zip(addresses[1:], distances[1:]):
+        info = spatial_index.address_index.lookup(nearby)
+        folium.CircleMarker([info.hdb_lat, info.hdb_lon], radius=4, color='gray', fill=True, tooltip=f'{nearby.title()} ({round(distance)} m)').add_to(m)
+    # Add your markers to the map
+    folium.Marker([address_info.hdb_lat, address_info.hdb_lon], popup="chosen unit", tooltip="chosen unit", icon=folium.Icon(color='red', prefix='fa', icon='home')).add_to(m)
+    folium.Marker([address_info.mrt_lat, address_info.mrt_lon], popup="MRT", tooltip="MRT", icon=folium.Icon(color='green', prefix='fa', icon='subway')).add_to(m)
+    for station in spatial_index.nearest_stations(address_info.hdb_lat, address_info.hdb_lon, NEARBY_STATIONS):
+        if station.name != address_info.closest_mrt:
+            folium.Marker([station.lat, station.lon], popup=station.name, tooltip=f'{station.name.title()} MRT ({round(station.distance_m)} m)', icon=folium.Icon(color='lightgreen', prefix='fa', icon='subway')).add_to(m)
+    folium.Circle([address_info.hdb_lat, address_info.hdb_lon], radius=PROXIMITY_RADIUS).add_to(m)
+    return m
+
+
+@st.cache_resource(show_spinner=False, max_entries=config.MAP_CACHE_SIZE)
+def proximity_map(address):
+    return build_proximity_map(address, load_address_index().lookup(address), load_spatial_index())
+
+
+def show_map(m, key=None):
+    from streamlit_folium import st_folium
+    # The apps never read map interactions back, so panning and zooming should not rerun the script
+    return st_folium(m, width=MAP_WIDTH, height=MAP_HEIGHT, returned_objects=[], key=key)
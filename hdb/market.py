@@ -0,0 +1,241 @@
+# Rollup cube of resale transactions by (town, flat_type, month) for the market overview page.
+# Usage: python -m hdb.market [--source final_HDB_for_model.parquet.gzip] [--output artifacts/market]
+#
+# Each cell holds the number of sales, the sums of price and price per sqm, and histograms of both
+# over fixed log-spaced bins. All of these add up, so any slice by towns, flat types and months is a
+# sum over cube axes, percentiles included, and ingested partitions fold in as another cube.
+import argparse
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from hdb import artifacts, config, data
+
+# Histogram bin edges; values outside the range land in the first or last bin
+BINS = 64
+PRICE_EDGES = np.geomspace(50_000, 2_500_000, BINS + 1)
+PRICE_PER_SQM_EDGES = np.geomspace(1_000, 25_000, BINS + 1)
+PERCENTILES = [25, 50, 75]
+FREQUENCIES = {'Month': 1, 'Quarter': 3, 'Year': 12}
+GROUPS = {'town': 0, 'flat_type': 1}
+
+
+def _bin(values, edges):
+    return np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+
+
+def histogram_percentiles(hist, edges, percentiles=PERCENTILES):
+    # Percentiles from histograms along the last axis, interpolated geometrically within a bin
+    hist = np.asarray(hist, dtype=np.float64)
+    cumulative = hist.cumsum(-1)
+    total = cumulative[..., -1:]
+    results = []
+    for q in percentiles:
+        target = total * q / 100
+        i = np.minimum((cumulative < target).sum(-1, keepdims=True), hist.shape[-1] - 1)
+        before = np.take_along_axis(cumulative, i, -1) - np.take_along_axis(hist, i, -1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.clip((target - before) / np.take_along_axis(hist, i, -1), 0, 1)
+        value = edges[i] * (edges[i + 1] / edges[i]) ** fraction
+        results.append(np.where(total > 0, value, np.nan)[..., 0])
+    return results
+
+
+class MarketCube:
+    def __init__(self, towns, flat_types, months, count, price_sum, ppsqm_sum, price_hist, ppsqm_hist,
+                 source_signature=None):
+        # count/price_sum/ppsqm_sum: (town, flat_type, month); *_hist: (town, flat_type, month, bin).
+        # months are consecutive datetime64[M] values
+        self.towns = list(towns)
+        self.flat_types = list(flat_types)
+        self.months = np.asarray(months, dtype='datetime64[M]')
+        self.count = count
+        self.price_sum = price_sum
+        self.ppsqm_sum = ppsqm_sum
+        self.price_hist = price_hist
+        self.ppsqm_hist = ppsqm_hist
+        self.source_signature = source_signature
+
+    @classmethod
+    def build(cls, df, source_signature=None):
+        price = df['resale_price'].to_numpy(dtype=np.float64)
+        area = df['floor_area_sqm'].to_numpy(dtype=np.float64)
+        town = pd.Categorical(df['town']).remove_unused_categories()
+        flat_type = pd.Categorical(df['flat_type']).remove_unused_categories()
+        month = pd.to_datetime(df['sold_year_month']).to_numpy().astype('datetime64[M]')
+        valid = (town.codes >= 0) & (flat_type.codes >= 0) & ~np.isnat(month) & (price > 0) & (area > 0)
+        price, area, month = price[valid], area[valid], month[valid]
+        t, f = town.codes[valid].astype(np.int64), flat_type.codes[valid].astype(np.int64)
+
+        if len(month):
+            months = np.arange(month.min(), month.max() + 1)
+        else:
+            months = np.array([], dtype='datetime64[M]')
+        shape = (len(town.categories), len(flat_type.categories), len(months))
+        cells = int(np.prod(shape))
+        # One flat cell index per sale, so every measure is a single bincount
+        cell = (t * shape[1] + f) * shape[2] + (month - months[:1]).astype(np.int64)
+        ppsqm = price / area
+        count = np.bincount(cell, minlength=cells)
+        hist_dtype = np.uint16 if count.max(initial=0) < 2**16 else np.uint32
+
+        def histogram(values, edges):
+            return np.bincount(cell * BINS + _bin(values, edges), minlength=cells * BINS).astype(hist_dtype)
+
+        return cls(town.categories.astype(str), flat_type.categories.astype(str), months,
+                   count.astype(np.uint32).reshape(shape),
+                   np.bincount(cell, weights=price, minlength=cells).reshape(shape),
+                   np.bincount(cell, weights=ppsqm, minlength=cells).reshape(shape),
+                   histogram(price, PRICE_EDGES).reshape(shape + (BINS,)),
+                   histogram(ppsqm, PRICE_PER_SQM_EDGES).reshape(shape + (BINS,)),
+                   source_signature)
+
+    @classmethod
+    def combine(cls, cubes):
+        # Sum of cubes over the union of their towns, flat types and months
+        cubes = [cube for cube in cubes if len(cube.months)] or cubes[:1]
+        towns = sorted(set().union(*(cube.towns for cube in cubes)))
+        flat_types = sorted(set().union(*(cube.flat_types for cube in cubes)))
+        months = np.arange(min(cube.months[0] for cube in cubes), max(cube.months[-1] for cube in cubes) + 1)
+        shape = (len(towns), len(flat_types), len(months))
+        result = cls(towns, flat_types, months, np.zeros(shape, np.uint32), np.zeros(shape), np.zeros(shape),
+                     np.zeros(shape + (BINS,), np.uint32), np.zeros(shape + (BINS,), np.uint32))
+        for cube in cubes:
+            cell = np.ix_([towns.index(town) for town in cube.towns],
+                          [flat_types.index(flat_type) for flat_type in cube.flat_types],
+                          np.arange(len(cube.months)) + int((cube.months[0] - months[0]).astype(np.int64)))
+            for name in ['count', 'price_sum', 'ppsqm_sum', 'price_hist', 'ppsqm_hist']:
+                getattr(result, name)[cell] += getattr(cube, name)
+        return result
+
+    def save(self, directory):
+        shape = self.count.shape
+        cells = pd.DataFrame({'count': self.count.ravel(), 'price_sum': self.price_sum.ravel(),
+                              'ppsqm_sum': self.ppsqm_sum.ravel()})
+        artifacts.save_frames({'cells': cells, 'price_hist': pd.DataFrame({'count': self.price_hist.ravel()}),
+                               'ppsqm_hist': pd.DataFrame({'count': self.ppsqm_hist.ravel()})},
+                              directory, towns=self.towns, flat_types=self.flat_types,
+                              first_month=str(self.months[0]) if len(self.months) else None,
+                              shape=list(shape), source_signature=self.source_signature)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        meta = artifacts.load_meta(directory)
+        frames = artifacts.load_frames(directory, mmap)
+        shape = tuple(meta['shape'])
+        months = np.datetime64(meta['first_month'] or 'NaT', 'M') + np.arange(shape[2])
+
+        def column(frame, name, cube_shape):
+            return np.asarray(frames[frame][name]).reshape(cube_shape)
+
+        return cls(meta['towns'], meta['flat_types'], months, column('cells', 'count', shape),
+                   column('cells', 'price_sum', shape), column('cells', 'ppsqm_sum', shape),
+                   column('price_hist', 'count', shape + (BINS,)), column('ppsqm_hist', 'count', shape + (BINS,)),
+                   meta.get('source_signature'))
+
+    def _positions(self, values, selected):
+        # All positions when nothing is selected
+        if not selected:
+            return slice(None)
+        return [values.index(value) for value in selected if value in values]
+
+    def rollup(self, towns=None, flat_types=None, start=None, end=None, freq='Month', by=None):
+        # One row per (group, period) with sales, means and percentiles of price and price per sqm.
+        # freq is a key of FREQUENCIES or None for the whole range; by is None, 'town' or 'flat_type'
+        first = np.searchsorted(self.months, np.datetime64(start, 'M')) if start is not None else 0
+        last = np.searchsorted(self.months, np.datetime64(end, 'M'), side='right') if end is not None else len(self.months)
+        t = self._positions(self.towns, towns)
+        f = self._positions(self.flat_types, flat_types)
+        months = self.months[first:last]
+        if freq is None or not len(months):
+            starts, periods = np.zeros(min(len(months), 1), dtype=np.int64), months[:1]
+        else:
+            # Months are consecutive, so each period is a contiguous run along the month axis
+            step = FREQUENCIES[freq]
+            index = months.astype(np.int64) // step
+            starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+            periods = (index[starts] * step).astype('datetime64[M]')
+
+        def reduce(array):
+            dtype = np.float64 if array.dtype.kind == 'f' else np.int64
+            array = array[t][:, f][:, :, first:last]
+            # Keep the grouping axis, sum the other of town/flat_type, then sum months into periods
+            array = array.sum((0, 1), dtype=dtype)[None] if by is None else array.sum(1 - GROUPS[by], dtype=dtype)
+            return np.add.reduceat(array, starts, axis=1) if len(starts) else array[:, :0]
+
+        count = reduce(self.count)
+        price_sum, ppsqm_sum = reduce(self.price_sum), reduce(self.ppsqm_sum)
+        price_hist, ppsqm_hist = reduce(self.price_hist), reduce(self.ppsqm_hist)
+        if by is None:
+            groups = ['All']
+        else:
+            values, positions = (self.towns, t) if by == 'town' else (self.flat_types, f)
+            groups = values if isinstance(positions, slice) else [values[i] for i in positions]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame = pd.DataFrame({
+                'group': np.repeat(groups, len(periods)),
+                'period': np.tile(periods.astype('datetime64[ns]'), len(groups)),
+                'sales': count.ravel(),
+                'mean_price': (price_sum / count).ravel(),
+                'mean_price_per_sqm': (ppsqm_sum / count).ravel(),
+            })
+        for q, values in zip(PERCENTILES, histogram_percentiles(price_hist, PRICE_EDGES)):
+            frame[f'price_p{q}'] = values.ravel()
+        for q, values in zip(PERCENTILES, histogram_percentiles(ppsqm_hist, PRICE_PER_SQM_EDGES)):
+            frame[f'price_per_sqm_p{q}'] = values.ravel()
+        return frame[frame['sales'] > 0].reset_index(drop=True)
+
+
+def read_market_cube(path=data.TRANSACTIONS_PATH, read=data.read_transactions):
+    # Use the prebuilt artifact when it was built from this exact file, otherwise read the
+    # transactions with read(path) and build in memory
+    expected = data.source_signature(path)
+    try:
+        cube = MarketCube.load(config.MARKET_CUBE_PATH)
+        if cube.source_signature == expected:
+            return cube
+    except FileNotFoundError:
+        pass
+    return MarketCube.build(read(path), expected)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_market_cube(path, signature):
+    if config.TRANSACTION_BACKEND == 'streaming':
+        # Read once for the build and dropped, so the streaming backend still holds no table
+        return read_market_cube(path)
+    # Otherwise the build reuses the table the transaction store maps
+    return read_market_cube(path, lambda path: data._load_transactions(path, signature))
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_market_cube_with(path, signature, partitions):
+    # Ingested partitions are folded in as a cube of their own
+    cube = _load_market_cube(path, signature)
+    rows = data.concat_frames([data.read_transactions(partition) for partition in partitions])
+    return MarketCube.combine([cube, MarketCube.build(rows)])
+
+
+def load_market_cube(path=data.TRANSACTIONS_PATH, partitions_dir=data.TRANSACTIONS_DIR):
+    signature = data.file_signature(path)
+    partitions = tuple(data.partition_files(partitions_dir))
+    if not partitions:
+        return _load_market_cube(path, signature)
+    return _load_market_cube_with(path, signature, partitions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the market rollup cube from the transaction history')
+    parser.add_argument('--source', default=data.TRANSACTIONS_PATH)
+    parser.add_argument('--output', default=config.MARKET_CUBE_PATH)
+    args = parser.parse_args(argv)
+    cube = MarketCube.build(data.read_transactions(args.source), data.source_signature(args.source))
+    cube.save(args.output)
+    print(f'Wrote {int(cube.count.sum()):,} sales in {len(cube.towns)} towns x {len(cube.flat_types)} flat types x '
+          f'{len(cube.months)} months to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
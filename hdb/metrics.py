@@ -0,0 +1,166 @@
+# Process-wide stage timers and counters, shown in the debug sidebar and exported as Prometheus
+# text or JSON. Every session in the process records into the same registry.
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from hdb import config
+
+# Percentiles are computed over the most recent samples of each stage
+WINDOW = 1024
+PREFIX = 'hdb'
+
+
+class Metrics:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._samples = {}
+        self._totals = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.window)
+                self._totals[stage] = [0, 0.0]
+            self._samples[stage].append(seconds)
+            self._totals[stage][0] += 1
+            self._totals[stage][1] += seconds
+
+    @contextmanager
+    def timer(self, stage):
+        # Records the duration even when the block raises (including st.stop())
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def register_gauges(self, name, read, labels=None):
+        # read() returns a dict of numbers, polled whenever the metrics are exported. Gauges registered
+        # under one name with different labels (e.g. one prediction cache per API URL) are kept apart
+        with self._lock:
+            self._gauges[(name, tuple(sorted((labels or {}).items())))] = read
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+    def stages(self):
+        with self._lock:
+            samples = {stage: np.fromiter(values, dtype=np.float64) for stage, values in self._samples.items()}
+            totals = {stage: tuple(total) for stage, total in self._totals.items()}
+        rows = []
+        for stage, values in samples.items():
+            count, total = totals[stage]
+            p50, p95 = np.percentile(values, [50, 95])
+            rows.append({'stage': stage, 'count': count, 'total_s': total, 'p50_s': float(p50),
+                         'p95_s': float(p95), 'last_s': float(values[-1])})
+        return rows
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def labelled_gauges(self):
+        # (metric, labels, value) rows, grouped by metric
+        with self._lock:
+            readers = dict(self._gauges)
+        rows = [(f'{name}_{key}', labels, float(value)) for (name, labels), read in readers.items()
+                for key, value in read().items()]
+        return sorted(rows, key=lambda row: row[:2])
+
+    def gauges(self):
+        return {f'{metric}{_label_text(labels)}': value for metric, labels, value in self.labelled_gauges()}
+
+    def to_json(self):
+        return json.dumps({'stages': self.stages(), 'counters': self.counters(), 'gauges': self.gauges()}, indent=2)
+
+    def to_prometheus(self):
+        lines = [f'# TYPE {PREFIX}_stage_seconds summary']
+        for row in self.stages():
+            label = f'stage="{row["stage"]}"'
+            lines.append(f'{PREFIX}_stage_seconds{{{label},quantile="0.5"}} {row["p50_s"]:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds{{{label},quantile="0.95"}} {row["p95_s"]:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{{label}}} {row["total_s"]:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{{label}}} {row["count"]}')
+        for name, value in self.counters().items():
+            lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+            lines.append(f'{PREFIX}_{name}_total {value}')
+        previous = None
+        for metric, labels, value in self.labelled_gauges():
+            if metric != previous:
+                lines.append(f'# TYPE {PREFIX}_{metric} gauge')
+                previous = metric
+            lines.append(f'{PREFIX}_{metric}{_label_text(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label_text(labels):
+    # (('url', 'http://...'),) -> '{url="http://..."}', with backslashes and quotes escaped
+    if not labels:
+        return ''
+    escaped = [(key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels]
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+METRICS = Metrics()
+observe = METRICS.observe
+timer = METRICS.timer
+increment = METRICS.increment
+register_gauges = METRICS.register_gauges
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = METRICS.to_prometheus(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = METRICS.to_json(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_failed = False
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=config.METRICS_PORT, host=config.METRICS_HOST):
+    # Serves /metrics (Prometheus) and /metrics.json once per process when HDB_METRICS_PORT is set.
+    # Binding is only tried once: when the port is taken (e.g. by another replica on the host) the
+    # failure is counted and the process carries on without the endpoint
+    global _server, _server_failed
+    with _server_lock:
+        if port and _server is None and not _server_failed:
+            try:
+                _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError:
+                _server_failed = True
+                METRICS.increment('metrics_server_errors')
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True, name='hdb-metrics').start()
+    return _server
@@ -0,0 +1,182 @@
+# Prediction backends: the remote API, or an exported model loaded into the app process.
+#
+# A local model receives a DataFrame with one row per query and the API parameter names as
+# columns (see hdb.features.PARAM_NAMES). Any feature engineering the API does server-side has
+# to be part of the exported model, e.g. as steps of a scikit-learn pipeline.
+import os
+
+import numpy as np
+import pandas as pd
+import requests
+import streamlit as st
+
+from hdb import config, metrics
+from hdb.cache import PredictionCache
+from hdb.client import PredictionClient
+from hdb.features import FORECAST_YEARS, PARAM_NAMES, forecast_array, horizon_frame
+
+
+class PredictionError(Exception):
+    pass
+
+
+class RemotePredictor:
+    def __init__(self, client):
+        self.client = client
+
+    def predict(self, params):
+        try:
+            return self.client.predict(params)
+        except requests.RequestException as e:
+            raise PredictionError(str(e)) from e
+
+    def full_predict(self, params):
+        try:
+            return self.client.full_predict(params)
+        except requests.RequestException as e:
+            raise PredictionError(str(e)) from e
+
+    def forecast(self, params):
+        return self._to_forecast(self.full_predict(params))
+
+    def predict_many(self, frame):
+        # One pooled request per row; rows that fail come back as NaN
+        results = np.full(len(frame), np.nan)
+        for i, params in enumerate(frame.to_dict('records')):
+            try:
+                results[i] = self.client.predict(params)
+            except requests.RequestException:
+                pass
+        return results
+
+    def predict_all(self, params):
+        try:
+            prediction, full_prediction = self.client.predict_all(params)
+        except requests.RequestException as e:
+            raise PredictionError(str(e)) from e
+        return prediction, self._to_forecast(full_prediction)
+
+    @staticmethod
+    def _to_forecast(full_prediction):
+        rows = sorted(full_prediction.values(), key=lambda row: row['sold_year'])
+        return forecast_array([row['sold_year'] for row in rows], [row['forecast'] for row in rows])
+
+
+class NumpyModel:
+    # Dense ReLU network stored as a .npz file, so inference needs nothing beyond NumPy.
+    # Arrays: numeric_features, numeric_mean, numeric_scale, categorical_features,
+    # categories_<feature> for each categorical feature (one-hot encoded in that order),
+    # W0, b0, W1, b1, ... for the layers, and optional target_scale/target_offset.
+    def __init__(self, arrays):
+        self.numeric_features = [str(name) for name in arrays['numeric_features']]
+        self.numeric_mean = np.asarray(arrays['numeric_mean'], dtype=np.float64)
+        self.numeric_scale = np.asarray(arrays['numeric_scale'], dtype=np.float64)
+        self.categorical_features = [str(name) for name in arrays['categorical_features']]
+        self.categories = {name: pd.Index(arrays[f'categories_{name}'].astype(str))
+                           for name in self.categorical_features}
+        self.layers = []
+        while f'W{len(self.layers)}' in arrays:
+            i = len(self.layers)
+            self.layers.append((np.asarray(arrays[f'W{i}'], dtype=np.float64), np.asarray(arrays[f'b{i}'], dtype=np.float64)))
+        self.target_scale = float(arrays['target_scale']) if 'target_scale' in arrays else 1.0
+        self.target_offset = float(arrays['target_offset']) if 'target_offset' in arrays else 0.0
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    def transform(self, frame):
+        numeric = frame[self.numeric_features].to_numpy(dtype=np.float64)
+        blocks = [(numeric - self.numeric_mean) / self.numeric_scale]
+        for name in self.categorical_features:
+            # Unknown categories get an all-zero one-hot row
+            codes = self.categories[name].get_indexer(frame[name].astype(str))
+            one_hot = np.zeros((len(frame), len(self.categories[name])))
+            known = codes >= 0
+            one_hot[np.flatnonzero(known), codes[known]] = 1.0
+            blocks.append(one_hot)
+        return np.hstack(blocks)
+
+    def predict(self, frame):
+        x = self.transform(frame)
+        for i, (weights, bias) in enumerate(self.layers):
+            x = x @ weights + bias
+            if i < len(self.layers) - 1:
+                np.maximum(x, 0.0, out=x)
+        return x.reshape(len(frame)) * self.target_scale + self.target_offset
+
+
+class LocalPredictor:
+    def __init__(self, model):
+        self.model = model
+
+    @classmethod
+    def from_path(cls, path):
+        if str(path).endswith('.npz'):
+            return cls(NumpyModel.load(path))
+        import joblib
+        return cls(joblib.load(path))
+
+    def _predict_frame(self, frame):
+        try:
+            return np.asarray(self.model.predict(frame), dtype=np.float64).ravel().round(2)
+        except (KeyError, ValueError) as e:
+            raise PredictionError(str(e)) from e
+
+    def predict(self, params):
+        return float(self._predict_frame(pd.DataFrame([params], columns=PARAM_NAMES))[0])
+
+    def predict_many(self, frame):
+        return self._predict_frame(frame[PARAM_NAMES])
+
+    def forecast(self, params):
+        # The whole horizon goes through the model as one batch
+        years = np.asarray(FORECAST_YEARS, dtype=np.int32)
+        return forecast_array(years, self._predict_frame(horizon_frame(params, years)))
+
+    def full_predict(self, params):
+        # Same shape as the /fullpredict JSON: {"0": {"sold_year": 2024, "forecast": ...}, ...}
+        return {str(i): {'sold_year': int(row['sold_year']), 'forecast': float(row['forecast'])}
+                for i, row in enumerate(self.forecast(params))}
+
+    def predict_all(self, params):
+        # Reuse the forecast row for the selected year instead of running the model again
+        forecast = self.forecast(params)
+        match = np.flatnonzero(forecast['sold_year'] == int(params['year']))
+        prediction = float(forecast['forecast'][match[0]]) if len(match) else self.predict(params)
+        return prediction, forecast
+
+
+def model_identity(base_url=None):
+    # Names the model a predictor answers from, so precomputed results are only used for that model
+    if config.PREDICTOR == 'local':
+        return f'local:{os.path.abspath(config.MODEL_PATH)}'
+    return (base_url or config.API_URL).rstrip('/')
+
+
+def make_predictor(base_url=None):
+    # The URL defaults to config.API_URL at call time, so tools can point the apps at a stub
+    if config.PREDICTOR == 'local':
+        predictor = LocalPredictor.from_path(config.MODEL_PATH)
+    else:
+        cache = PredictionCache()
+        base_url = (base_url or config.API_URL).rstrip('/')
+        # Each API's cache is reported under its own url label, so the Price Estimator's cache does
+        # not replace the default one's
+        metrics.register_gauges('prediction_cache', cache.stats, labels={'url': base_url})
+        predictor = RemotePredictor(PredictionClient(base_url, cache=cache))
+    if config.FORECAST_GRID_PATH and os.path.isdir(config.FORECAST_GRID_PATH):
+        # Imported here because hdb.grid builds on the predictors defined in this module
+        from hdb.grid import ForecastGrid, GridPredictor, grid_model
+        # A grid filled from another model (e.g. the default API when base_url names a different
+        # one) would answer for the wrong model, so it is only used for the model it was built from
+        if grid_model(config.FORECAST_GRID_PATH) == model_identity(base_url):
+            predictor = GridPredictor(ForecastGrid.load(config.FORECAST_GRID_PATH), predictor)
+    return predictor
+
+
+# One predictor per process, so every session shares its connection pool and prediction cache
+@st.cache_resource(show_spinner=False)
+def load_predictor(base_url=None):
+    return make_predictor(base_url)
@@ -0,0 +1,76 @@
+# Prefix and fuzzy address search over a sorted address list and a trigram index, built once per process.
+import re
+from bisect import bisect_left
+
+import numpy as np
+import streamlit as st
+
+from hdb import config, data
+from hdb.lookup import _build_address_index
+
+GRAM = 3
+# Share of the query's trigrams an address must contain to count as a fuzzy match
+MIN_FUZZY_SCORE = 0.5
+
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', str(text)).strip().upper()
+
+
+def trigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+class AddressSearch:
+    def __init__(self, addresses):
+        self.addresses = sorted(set(addresses))
+        self._normalized = [normalize(address) for address in self.addresses]
+        postings = {}
+        for i, address in enumerate(self._normalized):
+            for gram in trigrams(address):
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self._lengths = np.array([len(address) for address in self._normalized])
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def prefix(self, query, k):
+        query = normalize(query)
+        start = bisect_left(self._normalized, query)
+        matches = []
+        for i in range(start, len(self._normalized)):
+            if len(matches) == k or not self._normalized[i].startswith(query):
+                break
+            matches.append(i)
+        return matches
+
+    def fuzzy(self, query, k):
+        grams = trigrams(normalize(query))
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return []
+        hits = np.bincount(np.concatenate(lists), minlength=len(self.addresses))
+        candidates = np.flatnonzero(hits >= max(1, MIN_FUZZY_SCORE * len(grams)))
+        # Most shared trigrams first, then the shortest (closest) address
+        order = np.lexsort((self._lengths[candidates], -hits[candidates]))
+        return candidates[order[:k]].tolist()
+
+    def search(self, query, k=config.SEARCH_RESULTS):
+        if not normalize(query):
+            return self.addresses[:k]
+        matches = self.prefix(query, k)
+        if len(matches) < k:
+            seen = set(matches)
+            matches += [i for i in self.fuzzy(query, k + len(matches)) if i not in seen][:k - len(matches)]
+        return [self.addresses[i] for i in matches]
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_address_search(path, signature):
+    return AddressSearch(_build_address_index(path, signature).addresses)
+
+
+def load_address_search(path=data.UNIQUE_INFO_PATH):
+    return _build_address_search(path, data.file_signature(path))
@@ -0,0 +1,63 @@
+# Sidebar diagnostics shown with HDB_DEBUG=1: the per-session memory report and stage timings.
+# Session state should hold only selection keys and form values; heavy
+# objects (tables, maps, models) live in the process-wide caches and are resolved on each rerun.
+import sys
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from hdb import config
+from hdb.metrics import METRICS
+
+
+def value_size(value, seen=None):
+    # Approximate deep size in bytes, counting shared objects once
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(value_size(k, seen) + value_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(value_size(item, seen) for item in value)
+    elif hasattr(value, '__dict__'):
+        size += value_size(vars(value), seen)
+    return size
+
+
+def memory_report(state):
+    rows = [(str(key), type(value).__name__, value_size(value)) for key, value in state.items()]
+    report = pd.DataFrame(rows, columns=['key', 'type', 'bytes'])
+    return report.sort_values('bytes', ascending=False, ignore_index=True)
+
+
+def show_memory_report():
+    if not config.DEBUG:
+        return
+    report = memory_report(st.session_state.to_dict())
+    with st.sidebar.expander('Session memory'):
+        st.caption(f'{report["bytes"].sum():,} bytes in {len(report)} keys')
+        st.dataframe(report, hide_index=True)
+
+
+def show_timings():
+    if not config.DEBUG:
+        return
+    with st.sidebar.expander('Timings'):
+        stages = pd.DataFrame(METRICS.stages(), columns=['stage', 'count', 'total_s', 'p50_s', 'p95_s', 'last_s'])
+        for column in ['p50', 'p95', 'last']:
+            stages[f'{column} (ms)'] = (stages.pop(f'{column}_s') * 1000).round(1)
+        st.dataframe(stages.drop(columns='total_s'), hide_index=True)
+        values = {**METRICS.counters(), **METRICS.gauges()}
+        if values:
+            st.dataframe(pd.DataFrame(list(values.items()), columns=['metric', 'value']), hide_index=True)
+        st.download_button('Metrics (JSON)', METRICS.to_json(), file_name='metrics.json', mime='application/json')
+        st.download_button('Metrics (Prometheus)', METRICS.to_prometheus(), file_name='metrics.prom', mime='text/plain')
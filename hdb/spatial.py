@@ -0,0 +1,62 @@
+# Haversine ball trees over HDB blocks and MRT stations for nearest-station and radius queries.
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from hdb import config, data
+from hdb.lookup import _build_address_index
+
+EARTH_RADIUS_M = 6_371_000
+
+Station = namedtuple('Station', ['name', 'lat', 'lon', 'distance_m'])
+
+
+def _radians(lat, lon):
+    return np.radians(np.column_stack([lat, lon]))
+
+
+class SpatialIndex:
+    def __init__(self, address_index, stations=None):
+        # sklearn is the slowest import of the app, so it is deferred until an index is built
+        from sklearn.neighbors import BallTree
+        self.address_index = address_index
+        self._blocks = BallTree(_radians(address_index.hdb_lat, address_index.hdb_lon), metric='haversine')
+        if stations is None:
+            # Every station that is the closest MRT of at least one block
+            stations = pd.DataFrame({'mrt': address_index.closest_mrt, 'lat': address_index.mrt_lat,
+                                     'lon': address_index.mrt_lon}).drop_duplicates('mrt')
+        self.station_names = stations['mrt'].astype(str).to_numpy()
+        self.station_lat = stations['lat'].to_numpy(dtype=np.float64)
+        self.station_lon = stations['lon'].to_numpy(dtype=np.float64)
+        self._stations = BallTree(_radians(self.station_lat, self.station_lon), metric='haversine')
+
+    def nearest_stations(self, lat, lon, k=3):
+        k = min(k, len(self.station_names))
+        distances, positions = self._stations.query(_radians([lat], [lon]), k=k)
+        return [Station(self.station_names[i], float(self.station_lat[i]), float(self.station_lon[i]), float(d * EARTH_RADIUS_M))
+                for d, i in zip(distances[0], positions[0])]
+
+    def blocks_within(self, lat, lon, radius_m):
+        # Positions in the address index and distances in metres, nearest first
+        positions, distances = self._blocks.query_radius(_radians([lat], [lon]), r=radius_m / EARTH_RADIUS_M,
+                                                         return_distance=True, sort_results=True)
+        return positions[0], distances[0] * EARTH_RADIUS_M
+
+    def addresses_within(self, address, radius_m):
+        info = self.address_index.lookup(address)
+        if info is None:
+            return [], np.empty(0)
+        positions, distances = self.blocks_within(info.hdb_lat, info.hdb_lon, radius_m)
+        return self.address_index.addresses[positions].tolist(), distances
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_spatial_index(path, signature):
+    stations = pd.read_csv(config.MRT_STATIONS_PATH) if config.MRT_STATIONS_PATH else None
+    return SpatialIndex(_build_address_index(path, signature), stations)
+
+
+def load_spatial_index(path=data.UNIQUE_INFO_PATH):
+    return _build_spatial_index(path, data.file_signature(path))
@@ -0,0 +1,161 @@
+# Cold start: a background warm-up that loads the shared datasets and slow modules while the first
+# page is drawn, and a startup profile of where an app's import and load time goes.
+# Usage: python -m hdb.startup [--app streamlit_app.py pages/Price_Forecast.py] [--top 15] [--deferred] [--loaders]
+import argparse
+import ast
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from hdb import metrics
+
+# Modules every app only needs after the first paint, in the order they are first used. sklearn is
+# imported by the spatial index and plotly only by the graph app, which warms it up itself
+DEFERRED_MODULES = ['folium', 'streamlit_folium', 'hdb.predictor']
+SLOW_MODULES = DEFERRED_MODULES + ['plotly.express', 'sklearn.neighbors']
+
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)')
+
+_started = False
+_lock = threading.Lock()
+
+
+def _warm_up(loaders, modules):
+    start = time.perf_counter()
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            metrics.increment('warmup_errors')
+    for load in loaders:
+        try:
+            _resolve(load)()
+        except Exception:
+            # The session that needs it calls the loader itself and reports the error
+            metrics.increment('warmup_errors')
+    metrics.observe('warmup', time.perf_counter() - start)
+
+
+def _resolve(load):
+    # 'module:function' names a loader whose module is itself deferred
+    if isinstance(load, str):
+        module, name = load.split(':')
+        return getattr(importlib.import_module(module), name)
+    return load
+
+
+def warm_up(*loaders, modules=DEFERRED_MODULES):
+    # Starts once per process. The loaders are the cached load_* functions (or 'module:function'
+    # names), so a session that needs one before the thread gets to it waits for the same cache
+    # entry rather than loading it twice
+    global _started
+    with _lock:
+        if _started:
+            return None
+        _started = True
+    thread = threading.Thread(target=_warm_up, args=(loaders, modules), daemon=True, name='hdb-warmup')
+    thread.start()
+    return thread
+
+
+def app_imports(app_path):
+    # Modules imported at the top level of an app script, in order
+    with open(app_path) as f:
+        tree = ast.parse(f.read(), app_path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def import_profile(modules):
+    # Imports the modules in a fresh interpreter under -X importtime and returns one
+    # (module, self_s, cumulative_s, depth) row per module loaded
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')]))}
+    code = '\n'.join(f'import {module}' for module in modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            env=env)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us) / 1e6, int(cumulative_us) / 1e6, (len(indent) - 1) // 2))
+    return rows
+
+
+def time_loaders(loaders):
+    # Seconds each loader takes on first call in this process (imports it triggers included)
+    timings = []
+    for name, load in loaders:
+        start = time.perf_counter()
+        load()
+        timings.append((name, time.perf_counter() - start))
+    return timings
+
+
+def app_loaders():
+    from hdb.comparables import load_comparables
+    from hdb.feature_table import load_feature_table
+    from hdb.lookup import load_address_index
+    from hdb.predictor import load_predictor
+    from hdb.search import load_address_search
+    from hdb.spatial import load_spatial_index
+    from hdb.transactions import load_transaction_store
+    return [('address_search', load_address_search), ('address_index', load_address_index),
+            ('feature_table', load_feature_table), ('transaction_store', load_transaction_store),
+            ('spatial_index', load_spatial_index), ('comparables', load_comparables),
+            ('predictor', load_predictor)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report where an app's startup time is spent")
+    parser.add_argument('--app', nargs='+', default=['streamlit_app.py', 'pages/Price_Forecast.py'],
+                        help='entry script and the pages whose imports the first paint runs')
+    parser.add_argument('--top', type=int, default=15, help='number of packages and modules listed')
+    parser.add_argument('--deferred', action='store_true', help='also profile the modules imported on first use')
+    parser.add_argument('--loaders', action='store_true', help='also time the dataset loaders (run from the data directory)')
+    args = parser.parse_args(argv)
+
+    modules = list(dict.fromkeys(module for script in args.app for module in app_imports(script)))
+    if args.deferred:
+        modules += [module for module in SLOW_MODULES if module not in modules]
+    rows = import_profile(modules)
+    total = sum(self_s for _, self_s, _, _ in rows)
+    print(f'{", ".join(args.app)}: {len(rows)} modules imported in {total * 1000:.0f} ms')
+
+    print('  imports of the app, in order (cumulative, excluding modules already loaded):')
+    for module, _, cumulative_s, depth in rows:
+        if depth == 0 and module in modules:
+            print(f'    {module:<32} {cumulative_s * 1000:8.1f} ms')
+
+    packages = {}
+    for module, self_s, _, _ in rows:
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0.0) + self_s
+    print('  by package (own time of all its modules):')
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f'    {package:<32} {seconds * 1000:8.1f} ms  {seconds / total:6.1%}')
+
+    print('  slowest modules (own time):')
+    for module, self_s, _, _ in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f'    {module:<48} {self_s * 1000:8.1f} ms')
+
+    if args.loaders:
+        print('  dataset loaders (first call, in this process):')
+        for name, seconds in time_loaders(app_loaders()):
+            print(f'    {name:<32} {seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
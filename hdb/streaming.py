@@ -0,0 +1,164 @@
+# Serves the transaction queries by scanning Parquet files one row group at a time instead of
+# holding the table in memory. The backend scans a snapshot written by this module: one file per
+# town, sorted by SNAPSHOT_ORDER in small row groups, with the row groups of each (flat_type,
+# lease_commence_date) run recorded in its meta.json. A query only decodes its own run, however long
+# the history gets, and within it (and in the ingested partitions) row groups whose statistics
+# cannot match the query are skipped without being read (predicate pushdown).
+# Usage: python -m hdb.streaming [--source final_HDB_for_model.parquet.gzip] [--output artifacts/transactions_by_town]
+import argparse
+import functools
+import os
+from urllib.parse import quote
+
+import fastparquet
+import numpy as np
+import pandas as pd
+
+from hdb import artifacts, config, data
+from hdb.transactions import RECENT_COLUMN_NAMES, RECENT_COLUMNS
+
+# Recent queries are memoized, since every rerun after a submit asks the same question again
+QUERY_CACHE_SIZE = 1024
+ROW_GROUP_SIZE = 2_000
+SNAPSHOT_ORDER = ['flat_type', 'lease_commence_date', 'address', 'sold_year_month']
+SNAPSHOT_FILE = 'part-0.parquet'
+
+
+def town_segment(town):
+    # Same directory naming as the ingested partitions, e.g. town=KALLANG%2FWHAMPOA
+    return f'town={quote(town, safe=" ")}'
+
+
+def run_groups(rows, row_group_size):
+    # [flat_type, lease_commence_date, first row group, stop row group] of each run in sorted rows
+    keys = rows[['flat_type', 'lease_commence_date']]
+    starts = np.flatnonzero((keys != keys.shift()).any(axis=1).to_numpy())
+    stops = np.append(starts[1:], len(rows))
+    return [[str(rows['flat_type'].iat[start]), int(rows['lease_commence_date'].iat[start]),
+             int(start // row_group_size), int((stop - 1) // row_group_size + 1)] for start, stop in zip(starts, stops)]
+
+
+def write_snapshot(source=data.TRANSACTIONS_PATH, directory=config.STREAMING_SNAPSHOT_PATH,
+                   row_group_size=ROW_GROUP_SIZE):
+    df = data.read_transactions(source).sort_values(SNAPSHOT_ORDER, kind='stable', ignore_index=True)
+    df = df.astype({col: str for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    towns = {town: rows.reset_index(drop=True) for town, rows in df.groupby('town', sort=True)}
+
+    def write(tmp):
+        for town, rows in towns.items():
+            os.makedirs(os.path.join(tmp, town_segment(town)))
+            rows.to_parquet(os.path.join(tmp, town_segment(town), SNAPSHOT_FILE), index=False,
+                            row_group_size=row_group_size)
+    # The town and lease of each address lead an address query to its run; the lease is left out
+    # for the rare address recorded with several, which is then looked up by statistics alone
+    blocks = df.groupby('address')[['town', 'lease_commence_date']].agg(['first', 'nunique'])
+    lease = blocks[('lease_commence_date', 'first')].where(blocks[('lease_commence_date', 'nunique')] == 1)
+    blocks = {address: [town, None if pd.isna(lcd) else int(lcd)]
+              for address, town, lcd in zip(blocks.index, blocks[('town', 'first')], lease)}
+    artifacts.save_files(directory, write, source_signature=data.source_signature(source), rows=len(df),
+                         blocks=blocks, runs={town: run_groups(rows, row_group_size) for town, rows in towns.items()})
+    return len(df)
+
+
+class StreamingTransactionStore:
+    def __init__(self, path=data.TRANSACTIONS_PATH, partitions_dir=data.TRANSACTIONS_DIR,
+                 snapshot_dir=config.STREAMING_SNAPSHOT_PATH):
+        self.path = path
+        self.partitions_dir = partitions_dir
+        try:
+            meta = artifacts.load_meta(snapshot_dir)
+        except FileNotFoundError:
+            raise FileNotFoundError(f'The streaming backend needs {snapshot_dir}; '
+                                    f'build it with python -m hdb.streaming') from None
+        if meta.get('source_signature') != data.source_signature(path):
+            raise ValueError(f'{snapshot_dir} was built from another version of {path}; '
+                             f'rebuild it with python -m hdb.streaming')
+        self.blocks = meta['blocks']
+        self.runs = {(town, flat_type, lease_commence_date): (first, stop)
+                     for town, runs in meta['runs'].items() for flat_type, lease_commence_date, first, stop in runs}
+        # Only the footers are read, so keeping every town's file open costs little
+        self.snapshot = {town: fastparquet.ParquetFile(os.path.join(snapshot_dir, town_segment(town), SNAPSHOT_FILE))
+                         for town in meta['runs']}
+
+    @property
+    def version(self):
+        return ('streaming', tuple(data.partition_files(self.partitions_dir)))
+
+    def _sources(self, town, flat_type, lease_commence_date):
+        # (snapshot town or partition path, row groups) to scan: the run of the snapshot when the town
+        # and lease are known, and the ingested partitions of the town (all of them when it is not)
+        if town is None or lease_commence_date is None:
+            sources = [(name, None) for name in self.snapshot if town is None or name == town]
+        else:
+            run = self.runs.get((town, flat_type, lease_commence_date))
+            sources = [] if run is None else [(town, run)]
+        partitions = data.partition_files(self.partitions_dir)
+        if town is not None:
+            # Ingested partitions are laid out by town too, so other towns' files are never opened
+            partitions = [path for path in partitions if os.path.basename(os.path.dirname(path)) == town_segment(town)]
+        return tuple(sources + [(path, None) for path in partitions])
+
+    def _scan(self, sources, filters, columns):
+        for source, groups in sources:
+            parquet = self.snapshot[source] if source in self.snapshot else fastparquet.ParquetFile(source)
+            if groups is not None:
+                parquet = parquet[groups[0]:groups[1]]
+            for chunk in parquet.iter_row_groups(filters=filters, columns=columns):
+                mask = pd.Series(True, index=chunk.index)
+                for column, _, value in filters:
+                    mask &= chunk[column] == value
+                if mask.any():
+                    yield chunk[mask]
+
+    def recent_transactions(self, address, flat_type, n=5):
+        # Addresses not in the snapshot (only in ingested partitions) are looked up in every file
+        town, lease_commence_date = self.blocks.get(address, (None, None))
+        result = self._recent_transactions(address, flat_type, n, self._sources(town, flat_type, lease_commence_date))
+        return result.copy()
+
+    @functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
+    def _recent_transactions(self, address, flat_type, n, sources):
+        best = None
+        filters = [('address', '==', address), ('flat_type', '==', flat_type)]
+        # Only the n latest sales seen so far are kept between row groups
+        for rows in self._scan(sources, filters, RECENT_COLUMNS + ['address']):
+            rows = rows[RECENT_COLUMNS].assign(sold_year_month=pd.to_datetime(rows['sold_year_month']))
+            best = rows if best is None else pd.concat([best, rows])
+            best = best.sort_values('sold_year_month', kind='stable').tail(n)
+        if best is None:
+            return pd.DataFrame()
+        # Latest first, with ties in the same order as the in-memory store
+        return best.iloc[::-1].rename(columns=RECENT_COLUMN_NAMES)
+
+    def historical_mean(self, town, flat_type, lease_commence_date):
+        lease_commence_date = int(lease_commence_date)
+        return self._historical_mean(town, flat_type, lease_commence_date,
+                                     self._sources(town, flat_type, lease_commence_date))
+
+    @functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
+    def _historical_mean(self, town, flat_type, lease_commence_date, sources):
+        sums = counts = None
+        filters = [('town', '==', town), ('flat_type', '==', flat_type), ('lease_commence_date', '==', lease_commence_date)]
+        # Running per-year sums and counts, so nothing beyond one row group is held at a time
+        for rows in self._scan(sources, filters, ['town', 'flat_type', 'lease_commence_date', 'sold_year', 'resale_price']):
+            grouped = rows['resale_price'].astype('float64').groupby(rows['sold_year'].astype('int64'))
+            sums = grouped.sum() if sums is None else sums.add(grouped.sum(), fill_value=0)
+            counts = grouped.count() if counts is None else counts.add(grouped.count(), fill_value=0)
+        if sums is None:
+            return pd.DataFrame({'sold_year': pd.Series(dtype='int64'), 'historical_mean': pd.Series(dtype='float64')})
+        means = (sums / counts).sort_index()
+        return pd.DataFrame({'sold_year': means.index.astype('int64'), 'historical_mean': means.to_numpy()})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the transaction snapshot the streaming backend scans')
+    parser.add_argument('--source', default=data.TRANSACTIONS_PATH)
+    parser.add_argument('--output', default=config.STREAMING_SNAPSHOT_PATH)
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args(argv)
+    rows = write_snapshot(args.source, args.output, args.row_group_size)
+    print(f'Wrote {rows:,} sales to {args.output} by town in row groups of {args.row_group_size:,}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# Local stand-in for the prediction API, for tests and benchmarks.
+# Usage: python -m hdb.stub_server --port 8000 [--delay 0.2]
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from hdb.features import FORECAST_YEARS, remaining_lease
+
+
+def stub_price(params, year=None):
+    # Deterministic made-up price, so repeated calls with the same inputs agree
+    year = int(params['year'] if year is None else year)
+    lease_commence_date = int(float(params['lease_commence_date']))
+    floor_area = float(params['floor_area_sqm'])
+    lease_left = remaining_lease(year, lease_commence_date)
+    return round(floor_area * 4500 + lease_left * 1500 + (year - 2024) * 2500, 2)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        time.sleep(self.delay)
+        try:
+            if url.path == '/predict':
+                body = {'hdb_pricing': stub_price(params)}
+            elif url.path == '/fullpredict':
+                body = {str(i): {'sold_year': year, 'forecast': stub_price(params, year)}
+                        for i, year in enumerate(FORECAST_YEARS)}
+            else:
+                self.send_error(404)
+                return
+        except (KeyError, ValueError) as e:
+            self.send_error(422, str(e))
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host='127.0.0.1', port=0, delay=0.0):
+    # Serves in a daemon thread; port=0 picks a free port. Returns (server, base_url)
+    handler = type('StubHandler', (StubHandler,), {'delay': delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local stub of the HDB prediction API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before each response')
+    args = parser.parse_args()
+    server, url = start_stub_server(args.host, args.port, args.delay)
+    print(f'Stub prediction API listening on {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,146 @@
+# Transaction table pre-sorted by (address, flat_type, sold_year_month) with precomputed historical means.
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from hdb import config, data
+
+SORT_COLUMNS = data.TRANSACTION_ORDER
+MEAN_KEYS = ['town', 'flat_type', 'lease_commence_date']
+
+RECENT_COLUMNS = ['sold_year_month', 'flat_type', 'storey_range', 'floor_area_sqm', 'resale_price']
+RECENT_COLUMN_NAMES = {'sold_year_month': 'Date Sold', 'flat_type': 'Flat Type', 'storey_range': 'Storey Range',
+                       'floor_area_sqm': 'Floor Area (sqm)', 'resale_price': 'Resale Price'}
+
+
+class TransactionStore:
+    def __init__(self, df, version=None, presorted=False):
+        # A presorted frame is used as is, so a memory-mapped table is not copied by the sort
+        self.frame = df if presorted else df.sort_values(SORT_COLUMNS, kind='stable', ignore_index=True)
+        self._slices = self._build_slices(self.frame)
+        self._sums, self._counts = self._group_totals(self.frame)
+        self._means = self._build_means(self._sums / self._counts)
+        # Identifies the data the store was built from; changes whenever new partitions are added
+        self.version = version
+
+    def extend(self, rows, version=None, frame=None):
+        # Adds newly ingested sales without re-reading the snapshot. Only the new rows are grouped;
+        # their totals are added to the existing ones before the means are rebuilt. frame is the
+        # merged and sorted table when it has already been built, e.g. mapped from a shared export
+        store = TransactionStore.__new__(TransactionStore)
+        store.frame = self.merge(rows) if frame is None else frame
+        store._slices = self._build_slices(store.frame)
+        sums, counts = self._group_totals(rows)
+        store._sums = self._sums.add(sums, fill_value=0)
+        store._counts = self._counts.add(counts, fill_value=0)
+        store._means = self._build_means(store._sums / store._counts)
+        store.version = version
+        return store
+
+    def merge(self, rows):
+        return data.concat_frames([self.frame, rows]).sort_values(SORT_COLUMNS, kind='stable', ignore_index=True)
+
+    @staticmethod
+    def _build_slices(df):
+        # Row ranges of each (address, flat_type) run in the sorted table
+        if df.empty:
+            return {}
+        new_group = (df['address'] != df['address'].shift()) | (df['flat_type'] != df['flat_type'].shift())
+        starts = np.flatnonzero(new_group.to_numpy())
+        stops = np.append(starts[1:], len(df))
+        addresses = df['address'].to_numpy()[starts]
+        flat_types = df['flat_type'].to_numpy()[starts]
+        return {(str(a), str(f)): (int(start), int(stop))
+                for a, f, start, stop in zip(addresses, flat_types, starts, stops)}
+
+    @staticmethod
+    def _group_totals(df):
+        # Sum and count of resale prices per (town, flat_type, lease_commence_date, sold_year), with
+        # plain index levels so totals from differently-categorized frames line up when added
+        keys = MEAN_KEYS + ['sold_year']
+        grouped = df['resale_price'].astype('float64').groupby([df[col] for col in keys], observed=True)
+        sums, counts = grouped.sum(), grouped.count().astype('float64')
+        index = pd.MultiIndex.from_arrays(
+            [sums.index.get_level_values(i).astype(str if col in ('town', 'flat_type') else 'int64')
+             for i, col in enumerate(keys)], names=keys)
+        return pd.Series(sums.to_numpy(), index=index), pd.Series(counts.to_numpy(), index=index)
+
+    @staticmethod
+    def _build_means(means):
+        # Mean resale prices grouped by (town, flat_type, lease_commence_date) for slice lookups
+        lookup = {}
+        for (town, flat_type, lease_commence_date), group in means.groupby(level=[0, 1, 2]):
+            lookup[(str(town), str(flat_type), int(lease_commence_date))] = pd.DataFrame({
+                'sold_year': group.index.get_level_values('sold_year').astype('int64'),
+                'historical_mean': group.to_numpy()})
+        return lookup
+
+    def row_range(self, address, flat_type):
+        return self._slices.get((address, flat_type), (0, 0))
+
+    def slice(self, address, flat_type):
+        start, stop = self.row_range(address, flat_type)
+        return self.frame.iloc[start:stop]
+
+    def recent_transactions(self, address, flat_type, n=5):
+        result = self.slice(address, flat_type)[RECENT_COLUMNS]
+        if result.empty:
+            return pd.DataFrame()
+        return result.iloc[::-1].head(n).rename(columns=RECENT_COLUMN_NAMES)
+
+    def historical_mean(self, town, flat_type, lease_commence_date):
+        result = self._means.get((town, flat_type, int(lease_commence_date)))
+        if result is None:
+            return pd.DataFrame({'sold_year': pd.Series(dtype='int64'), 'historical_mean': pd.Series(dtype='float64')})
+        return result
+
+
+class LiveTransactionStore:
+    # Holds the current store and folds in partitions that appear while the app is running
+    def __init__(self, store, partitions_dir):
+        self.store = store
+        self.partitions_dir = partitions_dir
+        self.loaded = set()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        new_files = [path for path in data.partition_files(self.partitions_dir) if path not in self.loaded]
+        if not new_files:
+            return self.store
+        with self._lock:
+            new_files = [path for path in new_files if path not in self.loaded]
+            if new_files:
+                rows = data.concat_frames([data.read_transactions(path) for path in new_files])
+                self.loaded.update(new_files)
+                # The merged table is exported once and mapped by every process that has loaded the
+                # same partitions, rather than each holding its own sorted copy
+                frame = data.read_shared('transactions_live', None, self._signature(),
+                                         lambda _: self.store.merge(rows))
+                self.store = self.store.extend(rows, version=(self.store.version[0], len(self.loaded)), frame=frame)
+        return self.store
+
+    def _signature(self):
+        # The snapshot's signature followed by the path and signature of each loaded partition
+        return [*self.store.version[0], *([path, *data.file_signature(path)] for path in sorted(self.loaded))]
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_transaction_store(path, signature, partitions_dir=data.TRANSACTIONS_DIR):
+    # The loaded table is already in SORT_COLUMNS order and, when shared, memory-mapped
+    store = TransactionStore(data._load_transactions(path, signature), version=(signature, 0), presorted=True)
+    return LiveTransactionStore(store, partitions_dir)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_streaming_store(path, signature, partitions_dir):
+    # Keyed on the signature, so a changed source is checked against the sorted snapshot again
+    from hdb.streaming import StreamingTransactionStore
+    return StreamingTransactionStore(path, partitions_dir)
+
+
+def load_transaction_store(path=data.TRANSACTIONS_PATH, partitions_dir=data.TRANSACTIONS_DIR):
+    if config.TRANSACTION_BACKEND == 'streaming':
+        return _build_streaming_store(path, data.file_signature(path), partitions_dir)
+    return _build_transaction_store(path, data.file_signature(path), partitions_dir).refresh()
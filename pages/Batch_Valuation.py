@@ -0,0 +1,46 @@
+# Batch valuation page: upload a CSV of units and download their predicted prices.
+import pandas as pd
+import streamlit as st
+
+from hdb.batch import BATCH_COLUMNS, prepare_batch, to_csv_bytes, to_parquet_bytes, value_batch
+from hdb.feature_table import load_feature_table
+from hdb.features import DEFAULT_YEAR
+from hdb.predictor import load_predictor
+
+
+st.write(f"""
+## Batch Valuation
+##### Upload a CSV with the columns {', '.join(f'`{col}`' for col in BATCH_COLUMNS)} and optionally `year` (defaults to {DEFAULT_YEAR}) to value many units at once.
+""")
+st.write('---')
+
+uploaded = st.file_uploader('Units to value', type='csv')
+
+if uploaded is not None:
+    try:
+        rows = prepare_batch(pd.read_csv(uploaded), load_feature_table().features)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+
+    if st.button(f'Value {len(rows):,} units'):
+        progress = st.progress(0.0, text='Valuing units...')
+        table = st.empty()
+        results = []
+        done = 0
+        # Show the results as each chunk comes back
+        for chunk in value_batch(rows, load_predictor()):
+            results.append(chunk)
+            done += len(chunk)
+            progress.progress(done / len(rows), text=f'{done:,} of {len(rows):,} units valued')
+            table.dataframe(pd.concat(results, ignore_index=True), hide_index=True, use_container_width=True)
+        results = pd.concat(results, ignore_index=True)
+
+        failed = (results['error'] != '').sum()
+        if failed:
+            st.warning(f'{failed:,} units could not be valued, see the error column')
+        # The downloads are built in this run and nothing is kept in the session, so the results go
+        # away with the next upload; clicking a download does not rerun the page
+        st.download_button('Download CSV', to_csv_bytes(results), 'valuations.csv', 'text/csv', on_click='ignore')
+        st.download_button('Download Parquet', to_parquet_bytes(results), 'valuations.parquet', 'application/octet-stream',
+                           on_click='ignore')
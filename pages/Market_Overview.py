@@ -0,0 +1,87 @@
+# Market overview page: price per sqm, sales volume and price percentiles by town, flat type and
+# month, sliced from the prebuilt rollup cube.
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from hdb import metrics
+from hdb.market import FREQUENCIES, load_market_cube
+
+
+st.write("""
+## Market Overview
+##### Resale prices per square metre, sales volume and the spread of prices across towns and flat types.
+""")
+st.write('---')
+
+with metrics.timer('market_load'):
+    cube = load_market_cube()
+if not len(cube.months):
+    st.write("No transactions found")
+    st.stop()
+
+# Filters; leaving towns or flat types empty means all of them
+st.sidebar.header('Filter Sales')
+towns = st.sidebar.multiselect('Town', cube.towns, placeholder='All towns')
+flat_types = st.sidebar.multiselect('Flat Type', cube.flat_types, placeholder='All flat types')
+first_year, last_year = int(str(cube.months[0])[:4]), int(str(cube.months[-1])[:4])
+if first_year < last_year:
+    start_year, end_year = st.sidebar.slider('Years', first_year, last_year, (max(first_year, last_year - 10), last_year))
+else:
+    start_year = end_year = first_year
+freq = st.sidebar.radio('Period', list(FREQUENCIES), index=1, horizontal=True)
+compare = st.sidebar.radio('Compare', ['None', 'Town', 'Flat Type'], horizontal=True)
+by = {'None': None, 'Town': 'town', 'Flat Type': 'flat_type'}[compare]
+selection = dict(towns=towns, flat_types=flat_types, start=f'{start_year}-01', end=f'{end_year}-12')
+
+with metrics.timer('market_rollup'):
+    summary = cube.rollup(**selection, freq=None)
+    trend = cube.rollup(**selection, freq=freq, by=by)
+    breakdown = cube.rollup(**selection, freq=None, by='town' if by != 'town' else 'flat_type')
+
+if summary.empty:
+    st.write("No sales match the filters")
+    st.stop()
+
+# Headline figures for the whole selected range
+overall = summary.iloc[0]
+sales, median_price, median_ppsqm = st.columns(3)
+sales.metric('Sales', f'{int(overall["sales"]):,}')
+median_price.metric('Median Price', f'SGD ${overall["price_p50"]:,.0f}')
+median_ppsqm.metric('Median Price per sqm', f'SGD ${overall["price_per_sqm_p50"]:,.0f}')
+st.write('---')
+
+# Price per sqm trend: the median with its interquartile range, or one median line per group
+st.header('Price per sqm')
+if by is None:
+    fig = px.line(trend, x='period', y=['price_per_sqm_p25', 'price_per_sqm_p50', 'price_per_sqm_p75'], markers=True)
+    names = {'price_per_sqm_p25': '25th percentile', 'price_per_sqm_p50': 'Median', 'price_per_sqm_p75': '75th percentile'}
+    fig.for_each_trace(lambda trace: trace.update(name=names[trace.name]))
+    fig.update_layout(legend_title='Legend')
+else:
+    fig = px.line(trend, x='period', y='price_per_sqm_p50', color='group', markers=True)
+    fig.update_layout(legend_title=compare)
+fig.update_layout(xaxis_title=freq, yaxis_title='Price per sqm (SGD)')
+st.plotly_chart(fig)
+
+# Sales volume
+st.header('Sales Volume')
+fig = px.bar(trend, x='period', y='sales', color='group' if by is not None else None)
+fig.update_layout(xaxis_title=freq, yaxis_title='Sales', legend_title=compare)
+st.plotly_chart(fig)
+st.write('---')
+
+# Breakdown of the whole range by town (or by flat type when comparing towns)
+label = 'Flat Type' if by == 'town' else 'Town'
+st.header(f'By {label}')
+table = pd.DataFrame({
+    label: breakdown['group'],
+    'Sales': breakdown['sales'],
+    'Median Price': breakdown['price_p50'].round(-3),
+    'Price p25': breakdown['price_p25'].round(-3),
+    'Price p75': breakdown['price_p75'].round(-3),
+    'Mean Price per sqm': breakdown['mean_price_per_sqm'].round(),
+    'Median Price per sqm': breakdown['price_per_sqm_p50'].round(),
+})
+st.dataframe(table.sort_values('Sales', ascending=False), hide_index=True, use_container_width=True)
+st.markdown('''*Percentiles are estimated from price histograms with bins about 6% wide*''')
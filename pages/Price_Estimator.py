@@ -0,0 +1,67 @@
+# Price estimator page: a single form over the address's recorded units, valued by the price
+# estimator API, with recent sales and the proximity map.
+import streamlit as st
+
+from hdb import core
+from hdb.features import prediction_params
+from hdb.lookup import address_rows
+
+ESTIMATOR_URL = 'https://hdb-price-estimator-utpkxrm6xa-ew.a.run.app'
+
+
+core.header("""
+# HDB Price Prediction App
+
+##### This application utilises historical HDB sales data, walking distances to the nearest MRT station, and economic indicators to forecast future price trends within Singapore. Select an address to explore!
+""")
+
+address = core.address_picker(button='Next')
+
+# If the address has been submitted, show additional inputs
+if st.session_state['address_submitted']:
+    # The submitted address's rows are sliced from the shared table on every rerun
+    filtered_df = address_rows(st.session_state['address'])
+    with st.sidebar.form(key='User Input HDB Features'):
+        # prediction_year
+        year = st.slider('Year', 2024, 2033, 2028)
+        # flat_type
+        flat_type = st.selectbox("Flat Type", sorted(filtered_df['flat_type'].unique()), placeholder="Choose an option", label_visibility="visible")
+        # storey_range
+        storey_range = st.selectbox("Storey Range", sorted(filtered_df['storey_range'].unique()), placeholder="Choose an option", label_visibility="visible")
+        # flat_model
+        flat_model = st.selectbox("Flat Model", sorted(filtered_df['flat_model'].unique()), placeholder="Choose an option", label_visibility="visible")
+        # floor_area_sqm
+        if filtered_df['floor_area_sqm'].min() == filtered_df['floor_area_sqm'].max():
+            floor_area = filtered_df['floor_area_sqm'].min()
+        else:
+            floor_area = st.slider('Flat Area (sqm)', int(filtered_df['floor_area_sqm'].min()), int(filtered_df['floor_area_sqm'].max()), int(filtered_df['floor_area_sqm'].median()))
+        submit_button = st.form_submit_button(label = 'Submit')
+
+        if submit_button and not st.session_state.submit_button:
+            st.session_state.submit_button = True
+
+    if st.session_state.submit_button:
+        # town:
+        town = filtered_df['town'].mode()[0]
+        # max_floor_lvl:
+        max_floor_lvl = filtered_df['max_floor_lvl'].mean()
+        # lease commencement date:
+        lease_commence_date = int(filtered_df['lease_commence_date'].mean())
+        # closest mrt:
+        closest_mrt = filtered_df['MRT'].mode()[0]
+        # closest walking time:
+        walking_time_mrt = filtered_df['walking_time_mrt'].mean()
+
+        params = prediction_params(year, town, flat_type, storey_range, floor_area, flat_model,
+                                   lease_commence_date, max_floor_lvl, closest_mrt, walking_time_mrt)
+
+        # https://hdb-price-estimator-utpkxrm6xa-ew.a.run.app/predict?year=2028&town=HOUGANG&flat_type=3%20ROOM&storey_range=13%20TO%2015%20&floor_area_sqm=95&flat_model=Simplified&lease_commence_date=1980&sold_remaining_lease=93&max_floor_lvl=12&most_closest_mrt=KALLANG&walking_time_mrt=1500
+        prediction = core.predict(params, base_url=ESTIMATOR_URL)
+
+        st.header('Prediction')
+        st.subheader(f'The predicted price of a {(flat_type).lower()} flat of {floor_area} sqm in {town.title()} is :orange[SGD ${round(prediction/1000)*1000:,}] in {year}')
+        # st.write(f'The predicted price of a {flat_type_selector} flat is SGD {round(prediction/1000000,2)} million in {year_selector}')
+        st.write('---')
+
+        core.show_recent_transactions(address, flat_type)
+        core.show_proximity_map(address)
@@ -0,0 +1,83 @@
+# Price forecast page: the predicted price with a yearly forecast against historical prices,
+# recent and comparable sales, and the proximity map.
+import pandas as pd
+import streamlit as st
+
+from hdb import core, metrics
+from hdb.comparables import RADIUS_M, load_comparables
+from hdb.transactions import load_transaction_store
+
+
+core.header("""
+## HDB Resale Price Prediction
+##### The AI - deep learning model is trained using twenty one different data variables to forecast HDB resale prices in Singapore. Select an address to explore!
+##### To learn more about how the model was built, [click here!](https://medium.com/@hargobind/not-your-average-hdb-resale-price-predictor-a0ea0c1fa6c2)
+""")
+
+address = core.address_picker()
+
+# If the address has been submitted, show additional inputs
+if st.session_state['address_submitted']:
+    unit = core.unit_picker()
+
+    if unit is not None:
+        flat_type, year, storey_range, flat_model, floor_area = unit
+        features, params = core.unit_features(flat_type, year, storey_range, floor_area, flat_model)
+        town = features['town']
+        lease_commence_date = features['lease_commence_date']
+        # remaining lease:
+        remaining_lease = 99 - (year - lease_commence_date)
+
+        # Get the prediction and the yearly forecast
+        prediction, forecast = core.predict(params, forecast=True)
+
+        with metrics.timer('historical_mean'):
+            # Get Prediction DataFrame
+            prediction_df = pd.DataFrame(forecast)
+            # Extract historical data from full HDB dataframe for plotting against test results
+            temp = load_transaction_store().historical_mean(town, flat_type, lease_commence_date)
+            # Include historical mean resale prices in test results dataframe
+            prediction_df = prediction_df.merge(temp, on = 'sold_year', how = 'left')
+
+        # Display Prediction
+        st.header('Prediction Results')
+        st.subheader(f'Predicted average resale price for {(flat_type).lower()} flats ({floor_area} m2), located in {town.title()}, with {remaining_lease} years of lease remaining in {year} is :orange[SGD ${prediction:,}].')
+
+        with metrics.timer('plot'):
+            # plotly is imported on first use, after the first paint (see hdb.startup)
+            import plotly.express as px
+            # Plot results with plotly to allow interactivity
+            fig = px.line(prediction_df, x='sold_year', y=['forecast', 'historical_mean'], markers = True,
+                          title = f'Resale Price Predictions by Year <br><sup>{flat_type.lower()} HDB in {town.lower()} built in {lease_commence_date}</sup>'
+                          )
+            fig.update_layout(xaxis_title='Resale Year',
+                              yaxis_title='Price',
+                              legend_title='Legend')
+            # Update legend names
+            fig.update_traces(overwrite=True, selector=dict(name="forecast"), name="AI - DNN Model")
+            fig.update_traces(overwrite=True, selector=dict(name="historical_mean"), name="Historical Average Price")
+
+            # display the plot
+            st.plotly_chart(fig)
+
+        # draw line
+        st.write('---')
+
+        core.show_recent_transactions(address, flat_type)
+
+        # Comparable Sales (needs the in-memory transaction backend)
+        comparables = load_comparables()
+        if comparables is not None:
+            st.header('Comparable Sales')
+            st.markdown(f'''*The most similar recent {flat_type.lower()} sales within {RADIUS_M}m, by floor area, storey, lease and distance*''')
+            with metrics.timer('comparables'):
+                comparable_sales = comparables.find(address, flat_type, floor_area, storey_range, lease_commence_date)
+            if not comparable_sales.empty:
+                comparable_sales['Address'] = comparable_sales['Address'].astype(str).str.title()
+                comparable_sales['Date Sold'] = pd.to_datetime(comparable_sales['Date Sold']).dt.strftime('%b %Y')
+                st.dataframe(comparable_sales, hide_index=True, use_container_width=True)
+            else:
+                st.write("No comparable sales found")
+            st.write('---')
+
+        core.show_proximity_map(address, nearby=True)
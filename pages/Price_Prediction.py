@@ -0,0 +1,33 @@
+# Price prediction page: the predicted price of the chosen unit, recent sales and the proximity map.
+import streamlit as st
+
+from hdb import core
+
+
+core.header("""
+# HDB Price Prediction App
+
+##### This application utilises historical HDB sales data, walking distances to the nearest MRT station, and economic indicators to forecast future price trends within Singapore. Select an address to explore!
+""")
+
+address = core.address_picker()
+
+# If the address has been submitted, show additional inputs
+if st.session_state['address_submitted']:
+    unit = core.unit_picker()
+
+    if unit is not None:
+        flat_type, year, storey_range, flat_model, floor_area = unit
+        features, params = core.unit_features(flat_type, year, storey_range, floor_area, flat_model)
+        town = features['town']
+
+        # Ask the configured predictor (remote API or local model)
+        prediction = core.predict(params)
+
+        st.header('Prediction')
+        st.subheader(f'The predicted price of a {(flat_type).lower()} flat of {floor_area} sqm in {town.title()} is :orange[SGD ${round(prediction/1000)*1000:,}] in {year}')
+        # st.write(f'The predicted price of a {flat_type_selector} flat is SGD {round(prediction/1000000,2)} million in {year_selector}')
+        st.write('---')
+
+        core.show_recent_transactions(address, flat_type)
+        core.show_proximity_map(address)
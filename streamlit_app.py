@@ -0,0 +1,6 @@
+# Single entry point of the app: every UI is a page of one multipage app, so they share one process,
+# one copy of the datasets and one set of caches.
+# Run with: streamlit run streamlit_app.py
+from hdb.core import run_app
+
+run_app()